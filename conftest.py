@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    yield
+    # Миниатюры строятся в пуле после ответа; их нужно дождаться, пока
+    # фикстуры теста не удалили временную папку с картинками.
+    from posts import thumbnails
+    thumbnails.shutdown()
@@ -0,0 +1,184 @@
+"""Очередь фоновых задач в базе данных.
+
+``enqueue(func, *args, **kwargs)`` записывает вызов функции в таблицу
+``core.Job``, а команда ``run_worker`` выполняет задачи в нескольких
+процессах. Задача пишется в текущей транзакции, поэтому обработчик
+увидит её только после фиксации — вместе с данными, которые ей нужны.
+
+Обработчик захватывает задачу на ``JOBS_VISIBILITY_TIMEOUT`` секунд.
+Если он упал, не закончив её, по истечении этого срока задачу заберёт
+другой. Задача, которая завершилась ошибкой, повторяется с удвоением
+задержки до ``max_attempts`` раз и затем остаётся в таблице со
+статусом ``failed``. Выполненные задачи удаляются.
+
+Функция задачи должна лежать на верхнем уровне модуля, аргументы —
+сериализоваться в JSON. Задача может выполниться дважды (обработчик
+упал после работы, но до удаления задачи), поэтому повтор не должен
+ничего портить.
+
+При ``JOBS_ENABLED = False`` задача выполняется сразу при постановке в
+очередь, как будто обработчик запущен в том же процессе.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import traceback
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Сколько готовых задач просматривается за одну попытку захвата: если
+# первую перехватил соседний процесс, берётся следующая.
+CLAIM_BATCH_SIZE = 10
+
+
+def task_name(func):
+    name = f'{func.__module__}.{func.__qualname__}'
+    if '<' in name:
+        raise ValueError(f'{name} нельзя найти по имени')
+    return name
+
+
+def enqueue(func, *args, delay=0, max_attempts=None, **kwargs):
+    """Ставит вызов ``func(*args, **kwargs)`` в очередь.
+
+    ``delay`` — через сколько секунд задачу можно выполнять.
+    """
+    payload = json.dumps({'args': args, 'kwargs': kwargs},
+                         cls=DjangoJSONEncoder)
+    if not settings.JOBS_ENABLED:
+        # Аргументы проходят через JSON и здесь, чтобы задача получала
+        # те же значения, что и из очереди.
+        call(func, payload)
+        return None
+    return Job.objects.create(
+        name=task_name(func),
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def call(func, payload):
+    data = json.loads(payload)
+    return func(*data['args'], **data['kwargs'])
+
+
+def retry_delay(attempts):
+    return min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.JOBS_RETRY_MAX_DELAY)
+
+
+def ready(now):
+    """Задачи, которые можно захватить: ждущие своего времени и брошенные
+    обработчиками, у которых истёк срок захвата."""
+    return (Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now))
+
+
+class Worker:
+    def __init__(self, worker_id=None):
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+
+    def claim(self):
+        """Захватывает готовую задачу или возвращает None.
+
+        Захват — условный UPDATE, поэтому два процесса не получат одну
+        задачу и без ``SELECT ... FOR UPDATE``, которого нет в SQLite.
+        """
+        now = timezone.now()
+        candidates = list(
+            Job.objects.filter(ready(now))
+            .order_by('run_at', 'pk')
+            .values_list('pk', flat=True)[:CLAIM_BATCH_SIZE]
+        )
+        timeout = timedelta(seconds=settings.JOBS_VISIBILITY_TIMEOUT)
+        for pk in candidates:
+            claimed = Job.objects.filter(ready(now), pk=pk).update(
+                status=Job.RUNNING,
+                locked_by=self.worker_id,
+                locked_until=now + timeout,
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return Job.objects.get(pk=pk)
+        return None
+
+    def execute(self, job):
+        if job.attempts > job.max_attempts:
+            # Все попытки кончились тем, что обработчик упал или не
+            # уложился в срок захвата.
+            self.finish(job, status=Job.FAILED,
+                        last_error='Истёк срок захвата задачи')
+            return
+        try:
+            call(import_string(job.name), job.payload)
+        except Exception:
+            logger.exception('Задача %s завершилась ошибкой', job)
+            error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                self.finish(job, status=Job.FAILED, last_error=error)
+            else:
+                self.finish(
+                    job,
+                    status=Job.QUEUED,
+                    last_error=error,
+                    run_at=(timezone.now()
+                            + timedelta(seconds=retry_delay(job.attempts))),
+                )
+            return
+        # Если задачу уже забрал другой обработчик, она его.
+        Job.objects.filter(pk=job.pk, locked_by=self.worker_id).delete()
+
+    def finish(self, job, **fields):
+        Job.objects.filter(pk=job.pk, locked_by=self.worker_id).update(
+            locked_by='', locked_until=None, **fields
+        )
+
+    def run_pending(self):
+        """Выполняет готовые задачи, пока они есть; возвращает их число."""
+        count = 0
+        while True:
+            job = self.claim()
+            if job is None:
+                return count
+            self.execute(job)
+            count += 1
+
+    def run(self, stop, poll_interval=None):
+        """Выполняет задачи, пока не выставлено событие ``stop``."""
+        poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+        while not stop.is_set():
+            # Долгоживущий процесс сам закрывает устаревшие соединения,
+            # как это делается после каждого запроса.
+            close_old_connections()
+            try:
+                job = self.claim()
+            except Exception:
+                logger.exception('Не удалось получить задачу')
+                job = None
+            if job is None:
+                stop.wait(poll_interval)
+            else:
+                self.execute(job)
+
+
+def run_process(stop, poll_interval=None):
+    """Точка входа дочернего процесса ``run_worker``."""
+    # Ctrl+C получает вся группа процессов; останавливает их родитель
+    # через ``stop``, дав закончить текущую задачу.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+    Worker().run(stop, poll_interval)
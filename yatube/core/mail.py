@@ -0,0 +1,71 @@
+"""Отправка писем через очередь фоновых задач.
+
+``QueuedEmailBackend`` подключается в ``EMAIL_BACKEND`` и только ставит
+письма в очередь, а отправляет их обработчик через
+``QUEUED_EMAIL_BACKEND``. Так письма вроде сброса пароля не задерживают
+ответ, а недоступный почтовый сервер не ломает страницу.
+
+В задаче хранится готовое письмо в формате MIME и конверт: адрес
+отправителя и получатели. Объект письма в базу не попадает, поэтому
+обработчику не нужно ничего распаковывать из pickle.
+"""
+import base64
+import email
+import email.policy
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import jobs
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            # Письмо с вложениями и альтернативами собирается здесь
+            # целиком; Bcc в заголовки не попадает, он есть в конверте.
+            jobs.enqueue(
+                send_message,
+                base64.b64encode(
+                    message.message().as_bytes(linesep='\r\n')
+                ).decode(),
+                message.from_email,
+                message.recipients(),
+            )
+        return len(email_messages)
+
+
+class RawMessage:
+    """Собранное письмо с интерфейсом, который нужен бэкендам Django."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def as_bytes(self, linesep='\n'):
+        # Письмо хранится с переводами строк SMTP.
+        return self.data.replace(b'\r\n', linesep.encode())
+
+    def get_charset(self):
+        return None
+
+
+class QueuedMessage(EmailMessage):
+    """Письмо из очереди: отправляется байт в байт, как было собрано."""
+
+    def __init__(self, data, from_email, recipients):
+        parsed = email.message_from_bytes(data, policy=email.policy.default)
+        super().__init__(subject=parsed.get('Subject', ''),
+                         from_email=from_email, to=recipients)
+        self.data = data
+
+    def message(self):
+        return RawMessage(self.data)
+
+    def recipients(self):
+        return self.to
+
+
+def send_message(data, from_email, recipients):
+    message = QueuedMessage(base64.b64decode(data), from_email, recipients)
+    get_connection(settings.QUEUED_EMAIL_BACKEND).send_messages([message])
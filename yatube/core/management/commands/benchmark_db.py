@@ -0,0 +1,167 @@
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_TEXT = 'Пост нагрузочного теста'
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет пропускную способность базы: параллельные post_create '
+        'и index в нескольких потоках. Запросы идут в отдельную '
+        'временную базу, созданную как тестовая, а ключи кэша получают '
+        'свой префикс, поэтому данные и кэш сайта не меняются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Число параллельных клиентов',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Сколько запросов делает каждый клиент',
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля запросов post_create среди всех запросов',
+        )
+
+    def handle(self, *args, **options):
+        old_name = self.create_database()
+        try:
+            with override_settings(CACHES=self.benchmark_caches()):
+                self.benchmark(options)
+        finally:
+            self.destroy_database(old_name)
+
+    def create_database(self):
+        """Создаёт пустую базу так же, как тестовый раннер; возвращает
+        имя настоящей базы или None, если база и так временная."""
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            return None
+        test_settings = connection.settings_dict['TEST']
+        if connection.vendor == 'sqlite' and not test_settings['NAME']:
+            # Общая база в памяти блокирует таблицы целиком, файловая
+            # ближе к настоящей нагрузке.
+            self.database_dir = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(
+                self.database_dir, 'benchmark.sqlite3'
+            )
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        return old_name
+
+    def destroy_database(self, old_name):
+        if old_name is None:
+            return
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if hasattr(self, 'database_dir'):
+            shutil.rmtree(self.database_dir, ignore_errors=True)
+
+    def benchmark_caches(self):
+        return {
+            alias: {
+                **options,
+                'KEY_PREFIX': f'{options.get("KEY_PREFIX", "")}:benchmark',
+            }
+            for alias, options in settings.CACHES.items()
+        }
+
+    def benchmark(self, options):
+        user, created = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME
+        )
+        self.results = {'index': [], 'post_create': []}
+        self.errors = []
+        self.lock = threading.Lock()
+        write_every = (
+            round(1 / options['write_ratio']) if options['write_ratio'] else 0
+        )
+        threads = [
+            threading.Thread(
+                target=self.run_client,
+                args=(user, number, options['requests'], write_every),
+            )
+            for number in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        Post.objects.filter(author=user, text=BENCHMARK_TEXT).delete()
+        if created:
+            user.delete()
+        self.report(options['threads'], elapsed)
+
+    def run_client(self, user, number, requests, write_every):
+        client = Client()
+        try:
+            client.force_login(user)
+            for i in range(requests):
+                is_write = write_every and (i + number) % write_every == 0
+                started = time.perf_counter()
+                if is_write:
+                    response = client.post(
+                        reverse('posts:post_create'), {'text': BENCHMARK_TEXT}
+                    )
+                else:
+                    response = client.get(reverse('posts:index'))
+                elapsed = time.perf_counter() - started
+                name = 'post_create' if is_write else 'index'
+                with self.lock:
+                    if response.status_code >= 400:
+                        self.errors.append(response.status_code)
+                    else:
+                        self.results[name].append(elapsed)
+        except Exception as error:
+            with self.lock:
+                self.errors.append(repr(error))
+        finally:
+            connections.close_all()
+
+    def report(self, threads, elapsed):
+        total = sum(len(timings) for timings in self.results.values())
+        self.stdout.write(
+            f'База: {connection.vendor} '
+            f'({connection.settings_dict["NAME"]})'
+        )
+        self.stdout.write(
+            f'Потоков: {threads}, запросов: {total}, '
+            f'ошибок: {len(self.errors)}, время: {elapsed:.2f} с, '
+            f'{total / elapsed:.1f} запросов/с'
+        )
+        for name, timings in self.results.items():
+            if not timings:
+                continue
+            timings.sort()
+            p95 = timings[math.ceil(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f'{name}: {len(timings)} запросов, '
+                f'медиана {statistics.median(timings) * 1000:.1f} мс, '
+                f'p95 {p95 * 1000:.1f} мс'
+            )
+        for error in self.errors[:10]:
+            self.stderr.write(f'Ошибка: {error}')
@@ -0,0 +1,82 @@
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.JOBS_WORKERS,
+            help='Число процессов-обработчиков; 0 — в текущем процессе',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = jobs.Worker().run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {count}'))
+            return
+
+        self.stopping = False
+
+        def shutdown(signum, frame):
+            # Здесь только флаг: выставить событие из обработчика сигнала
+            # нельзя, пока этот же поток ждёт его в wait().
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        if options['processes'] < 1:
+            stop = threading.Event()
+            workers = [threading.Thread(
+                target=jobs.Worker().run,
+                args=(stop, options['poll_interval']),
+            )]
+            workers[0].start()
+        else:
+            # Соединения с базой не должны достаться дочерним процессам.
+            connections.close_all()
+            stop = multiprocessing.Event()
+            workers = [self.start(stop, options)
+                       for _ in range(options['processes'])]
+        self.stdout.write(f'Запущено обработчиков: {len(workers)}')
+        while not self.stopping:
+            for number, worker in enumerate(workers):
+                if not worker.is_alive() and options['processes'] >= 1:
+                    self.stderr.write(
+                        f'Обработчик {worker.pid} завершился с кодом '
+                        f'{worker.exitcode}, перезапуск'
+                    )
+                    workers[number] = self.start(stop, options)
+            time.sleep(0.5)
+        self.stdout.write('Завершение после текущих задач...')
+        stop.set()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Обработчики остановлены'))
+
+    def start(self, stop, options):
+        process = multiprocessing.Process(
+            target=jobs.run_process,
+            args=(stop, options['poll_interval']),
+        )
+        process.start()
+        return process
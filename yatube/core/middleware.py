@@ -0,0 +1,46 @@
+from django.conf import settings
+
+from . import profiling
+from .routers import PIN_COOKIE, routing_state
+
+
+class ReplicaRoutingMiddleware:
+    """Хранит состояние выбора базы на время запроса.
+
+    Если во время запроса что-то записывалось в базу, ставит cookie,
+    которая временно отключает чтение с реплик.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing_state() as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос и отдаёт результат в ``Server-Timing``.
+
+    Стоит первым в ``MIDDLEWARE``, чтобы в замер попали запросы сессий
+    и аутентификации.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.is_requested(request):
+            return self.get_response(request)
+        with profiling.profiling() as profile:
+            response = self.get_response(request)
+        if profiling.is_visible(request):
+            profiling.stats.add(profiling.view_name(request), profile)
+            response['Server-Timing'] = profile.server_timing()
+        return response
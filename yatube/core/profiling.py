@@ -0,0 +1,262 @@
+"""Профилирование запросов.
+
+Для профилируемого запроса (см. ``core.middleware.ProfilingMiddleware``)
+считаются время ответа, число и время SQL-запросов, время отрисовки
+шаблонов и попадания в кэш. Результаты добавляются в заголовок
+``Server-Timing`` и накапливаются по именам вьюх в памяти процесса;
+сводку показывает ``core.views.profiling_stats``.
+
+Шаблоны замеряются бэкендом ``ProfiledDjangoTemplates``, который
+подключается в ``TEMPLATES`` вместо стандартного. Вне профилируемого
+запроса он ведёт себя как ``DjangoTemplates``.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+from django.template.backends.django import reraise
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+# Сколько последних замеров каждой вьюхи хранится для перцентилей.
+SAMPLES = 1000
+
+_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.in_cache_call = False
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join((
+            f'total;dur={self.duration * 1000:.1f}',
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="SQL: {self.sql_count}"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hits: {self.cache_hits}, '
+            f'misses: {self.cache_misses}"',
+        ))
+
+
+def record_sql(execute, sql, params, many, context):
+    profile = _profile.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_count += 1
+        profile.sql_time += time.perf_counter() - started
+
+
+def counting_get(cache, profile):
+    get = cache.get
+
+    def wrapped(key, default=None, version=None):
+        if profile.in_cache_call:
+            return get(key, default, version=version)
+        # Отдельный маркер отличает промах от закэшированного None.
+        missing = object()
+        value = get(key, missing, version=version)
+        if value is missing:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+
+    return wrapped
+
+
+def counting_get_many(cache, profile):
+    get_many = cache.get_many
+
+    def wrapped(keys, version=None):
+        keys = list(keys)
+        # Базовый get_many вызывает get для каждого ключа: эти вызовы
+        # уже посчитаны здесь.
+        profile.in_cache_call = True
+        try:
+            values = get_many(keys, version=version)
+        finally:
+            profile.in_cache_call = False
+        profile.cache_hits += len(values)
+        profile.cache_misses += len(keys) - len(values)
+        return values
+
+    return wrapped
+
+
+@contextmanager
+def count_cache_calls(profile):
+    """Считает попадания и промахи ``get`` и ``get_many`` всех кэшей.
+
+    Объекты кэша у каждого потока свои, поэтому обёртки ставятся на
+    экземпляры и видны только текущему запросу.
+    """
+    instances = [caches[alias] for alias in settings.CACHES]
+    for cache in instances:
+        cache.get = counting_get(cache, profile)
+        cache.get_many = counting_get_many(cache, profile)
+    try:
+        yield
+    finally:
+        for cache in instances:
+            del cache.get
+            del cache.get_many
+
+
+@contextmanager
+def profiling():
+    """Собирает профиль кода внутри блока во всех базах и кэшах."""
+    profile = RequestProfile()
+    token = _profile.set(profile)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_sql))
+            stack.enter_context(count_cache_calls(profile))
+            yield profile
+    finally:
+        profile.finish()
+        _profile.reset(token)
+
+
+class ProfiledTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        profile = _profile.get()
+        if profile is None:
+            return super().render(context, request)
+        # Вложенные отрисовки уже входят во время внешней.
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - started
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    rank = math.ceil(percent / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.samples = deque(maxlen=SAMPLES)
+
+    def add(self, profile):
+        self.requests += 1
+        self.duration += profile.duration
+        self.sql_count += profile.sql_count
+        self.sql_time += profile.sql_time
+        self.template_time += profile.template_time
+        self.cache_hits += profile.cache_hits
+        self.cache_misses += profile.cache_misses
+        self.samples.append(profile.duration)
+
+    def as_dict(self):
+        def per_request(value):
+            return round(value / self.requests, 2)
+
+        return {
+            'requests': self.requests,
+            'avg_ms': per_request(self.duration * 1000),
+            'p95_ms': round(percentile(self.samples, 95) * 1000, 2),
+            'max_ms': round(max(self.samples) * 1000, 2),
+            'avg_sql_count': per_request(self.sql_count),
+            'avg_sql_ms': per_request(self.sql_time * 1000),
+            'avg_template_ms': per_request(self.template_time * 1000),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+class ProfileStats:
+    """Накопленные профили по именам вьюх, общие для потоков процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, view_name, profile):
+        with self._lock:
+            self._views.setdefault(view_name, ViewStats()).add(profile)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: stats.as_dict()
+                for name, stats in sorted(self._views.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+stats = ProfileStats()
+
+
+def is_requested(request):
+    """Нужно ли профилировать запрос.
+
+    Профилируются все запросы при ``PROFILING_ENABLED`` или отдельные —
+    с заголовком ``X-Profile: 1``. Результат по заголовку получают
+    только сотрудники (см. ``is_visible``).
+    """
+    return (settings.PROFILING_ENABLED
+            or request.META.get(PROFILE_HEADER) == '1')
+
+
+def is_visible(request):
+    user = getattr(request, 'user', None)
+    return settings.PROFILING_ENABLED or bool(user and user.is_staff)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name
@@ -0,0 +1,86 @@
+"""Чтение с реплик базы данных.
+
+Вьюхи, помеченные ``reads_from_replica``, читают со случайной реплики
+из ``DATABASE_REPLICAS``; всё остальное, включая любую запись, идёт в
+``default``. После записи пользователь получает cookie и на
+``REPLICA_PIN_SECONDS`` секунд закрепляется за основной базой, чтобы
+сразу увидеть свои изменения, пока они доходят до реплик.
+
+Состояние хранится в contextvar на время запроса (см.
+``core.middleware.ReplicaRoutingMiddleware``), поэтому вне запроса —
+в командах, тестах, пуле миниатюр — всегда используется ``default``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'use_primary'
+
+_state = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self):
+        self.use_replicas = False
+        self.wrote = False
+
+
+@contextmanager
+def routing_state():
+    state = RoutingState()
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def is_pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def reads_from_replica(view):
+    """Направляет чтение во вьюхе на реплики, если они есть."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        state = _state.get()
+        if state is not None and not is_pinned(request):
+            state.use_replicas = True
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+def replica_reads():
+    """Идёт ли сейчас чтение с реплики.
+
+    Реплика может отставать, поэтому прочитанное с неё нельзя кэшировать
+    наравне с данными основной базы.
+    """
+    state = _state.get()
+    # После записи в этом же запросе читаем то, что записали.
+    if state is None or not state.use_replicas or state.wrote:
+        return False
+    return bool(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replica_reads():
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
@@ -0,0 +1,22 @@
+"""Помощники для тестов."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def execute_on_commit(using=DEFAULT_DB_ALIAS):
+    """Выполняет колбэки ``transaction.on_commit``, добавленные в блоке.
+
+    ``TestCase`` не фиксирует транзакцию, поэтому такие колбэки в тестах
+    сами не срабатывают. Аналог ``captureOnCommitCallbacks(execute=True)``
+    из Django 3.2.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    # Колбэк может добавить новые: они выполняются следом.
+    while start < len(connection.run_on_commit):
+        _, callback = connection.run_on_commit[start]
+        start += 1
+        callback()
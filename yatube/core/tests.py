@@ -1,5 +1,30 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs, profiling
+from core.env import cache_from_url, database_from_url
+from core.models import Job
+from core.routers import PIN_COOKIE, ReplicaRouter, routing_state
+from core.testing import execute_on_commit
+from posts import caching
+from posts.models import Follow, Post, TimelineEntry
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +32,423 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class CacheFromUrlTests(TestCase):
+    def test_locmem_is_default(self):
+        config = cache_from_url('locmem://', KEY_PREFIX='yatube',
+                                LOCATION='pages')
+        self.assertEqual(config, {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'KEY_PREFIX': 'yatube',
+            'LOCATION': 'pages',
+        })
+
+    def test_file_cache_with_options(self):
+        config = cache_from_url(
+            'file:///var/tmp/yatube?timeout=60&max_entries=5000'
+        )
+        self.assertEqual(config['LOCATION'], '/var/tmp/yatube')
+        self.assertEqual(config['TIMEOUT'], 60)
+        self.assertEqual(config['OPTIONS'], {'MAX_ENTRIES': 5000})
+
+    def test_memcached_servers(self):
+        config = cache_from_url('memcached://cache1:11211,cache2:11211')
+        self.assertEqual(config['LOCATION'], ['cache1:11211', 'cache2:11211'])
+
+    def test_redis_keeps_credentials(self):
+        config = cache_from_url('redis://:secret@redis:6379/1?timeout=30')
+        self.assertEqual(config['BACKEND'], 'django_redis.cache.RedisCache')
+        self.assertEqual(config['LOCATION'], 'redis://:secret@redis:6379/1')
+        self.assertEqual(config['TIMEOUT'], 30)
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cache_from_url('mongodb://localhost')
+
+
+class SharedCacheTests(TestCase):
+    """Процессы с файловым кэшем видят общие версии фрагментов."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+
+    def worker(self):
+        # Каждый override_settings создаёт новые экземпляры кэшей, как
+        # в отдельном процессе.
+        config = cache_from_url(f'file://{self.location}',
+                                KEY_PREFIX='yatube:pages', VERSION=1)
+        return override_settings(CACHES={
+            'default': config, 'index_page': config,
+        })
+
+    def test_version_bump_reaches_other_worker(self):
+        with self.worker():
+            version = caching.get_version(caching.GROUP, 1)
+        with self.worker():
+            self.assertEqual(caching.get_version(caching.GROUP, 1), version)
+            with execute_on_commit():
+                caching.bump_version(caching.GROUP, 1)
+        with self.worker():
+            self.assertEqual(caching.get_version(caching.GROUP, 1),
+                             version + 1)
+
+    def test_cache_version_separates_deploys(self):
+        with self.worker():
+            caches['index_page'].set('key', 'old')
+            self.assertIsNone(caches['index_page'].get('key', version=2))
+
+
+class DatabaseFromUrlTests(TestCase):
+    def test_sqlite_path(self):
+        config = database_from_url('sqlite:////srv/yatube/db.sqlite3',
+                                   CONN_MAX_AGE=60)
+        self.assertEqual(config, {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': '/srv/yatube/db.sqlite3',
+            'CONN_MAX_AGE': 60,
+        })
+
+    def test_postgres(self):
+        config = database_from_url(
+            'postgres://yatube:p%40ss@db:6432/yatube?sslmode=require',
+            DISABLE_SERVER_SIDE_CURSORS=True,
+        )
+        self.assertEqual(config, {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': 'yatube',
+            'USER': 'yatube',
+            'PASSWORD': 'p@ss',
+            'HOST': 'db',
+            'PORT': '6432',
+            'OPTIONS': {'sslmode': 'require'},
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+        })
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_url('oracle://db/yatube')
+
+
+class SqlitePragmaTests(TestCase):
+    def test_pragmas_are_applied(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    def test_reads_and_writes(self):
+        # Тестовая база в памяти блокирует таблицы целиком, поэтому
+        # здесь один поток; параллельный прогон — на файловой базе.
+        stdout, stderr = StringIO(), StringIO()
+        call_command('benchmark_db', threads=1, requests=6, write_ratio=0.5,
+                     stdout=stdout, stderr=stderr)
+        self.assertIn('запросов: 6, ошибок: 0', stdout.getvalue())
+        self.assertIn('post_create: 3 запросов', stdout.getvalue())
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertFalse(Post.objects.exists())
+
+
+class ReplicaRouterTests(TestCase):
+    """Реплика — отдельный файл SQLite со своими данными, поэтому видно,
+    из какой базы прочитана страница."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+            'TEST': {},
+        }
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            call_command('migrate', database='replica', verbosity=0)
+            author = get_user_model().objects.db_manager(
+                'replica'
+            ).create_user('replica')
+            Post.objects.using('replica').create(
+                author=author, text='Пост с реплики'
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['index_page'].clear()
+        self.user = get_user_model().objects.create_user('auth')
+        Post.objects.create(author=self.user, text='Пост с основной базы')
+
+    def test_without_replicas_reads_go_to_default(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост с основной базы')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_feed_reads_from_replica(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост с реплики')
+        self.assertNotContains(response, 'Пост с основной базы')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_write_pins_user_to_default(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+
+    @override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_SHARED=True)
+    def test_replica_page_has_no_etag(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('ETag'))
+        self.client.cookies[PIN_COOKIE] = '1'
+        response = self.client.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('ETag'))
+
+    @override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_SHARED=True)
+    def test_pinned_user_does_not_get_replica_fragment(self):
+        self.client.get(reverse('posts:index'))
+        self.client.cookies[PIN_COOKIE] = '1'
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост с основной базы')
+        self.assertNotContains(response, 'Пост с реплики')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_routing_outside_requests(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Post))
+        with routing_state() as state:
+            state.use_replicas = True
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_write(Post), 'default')
+            self.assertIsNone(router.db_for_read(Post))
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        profiling.stats.reset()
+        self.client.force_login(self.staff)
+
+    def get_profiled(self, url):
+        return self.client.get(url, HTTP_X_PROFILE='1')
+
+    def test_header_profiles_staff_request(self):
+        response = self.get_profiled(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="SQL: [1-9]\d*"')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        views = profiling.stats.snapshot()
+        self.assertEqual(views['posts:index']['requests'], 1)
+        self.assertGreater(views['posts:index']['avg_sql_count'], 0)
+
+    def test_not_profiled_without_header(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(profiling.stats.snapshot(), {})
+
+    def test_header_ignored_for_other_users(self):
+        self.client.force_login(self.user)
+        response = self.get_profiled(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_setting_profiles_every_request(self):
+        self.client.logout()
+        response = self.client.get(reverse('about:author'))
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('about:author', profiling.stats.snapshot())
+
+    def test_counts_cache_hits(self):
+        url = reverse('posts:index')
+        self.get_profiled(url)
+        response = self.get_profiled(url)
+        self.assertRegex(response['Server-Timing'], r'hits: [1-9]')
+        self.assertGreater(
+            profiling.stats.snapshot()['posts:index']['cache_misses'], 0
+        )
+
+    def test_stats_endpoint(self):
+        self.get_profiled(reverse('posts:index'))
+        url = reverse('core:profiling')
+        response = self.client.get(url)
+        self.assertEqual(response.json()['views']['posts:index']['requests'],
+                         1)
+        self.client.post(url)
+        self.assertEqual(profiling.stats.snapshot(), {})
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('core:profiling'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+calls = []
+
+
+def record(value, extra=None):
+    calls.append((value, extra))
+
+
+def explode():
+    raise RuntimeError('Сбой задачи')
+
+
+@override_settings(JOBS_ENABLED=True, JOBS_MAX_ATTEMPTS=3,
+                   JOBS_RETRY_DELAY=10)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = jobs.Worker('test-worker')
+
+    def test_enqueued_job_runs_in_worker(self):
+        job = jobs.enqueue(record, 1, extra='a')
+        self.assertEqual(job.name, 'core.tests.record')
+        self.assertEqual(calls, [])
+        self.assertEqual(self.worker.run_pending(), 1)
+        self.assertEqual(calls, [(1, 'a')])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_ENABLED=False)
+    def test_runs_immediately_when_disabled(self):
+        self.assertIsNone(jobs.enqueue(record, 2))
+        self.assertEqual(calls, [(2, None)])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delayed_job_waits(self):
+        jobs.enqueue(record, 3, delay=60)
+        self.assertEqual(self.worker.run_pending(), 0)
+        self.assertEqual(calls, [])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = jobs.enqueue(explode)
+        started = timezone.now()
+        self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Сбой задачи', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertGreaterEqual(job.run_at,
+                                timezone.now() + timedelta(seconds=19))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(self.worker.run_pending(), 0)
+
+    def test_abandoned_job_is_reclaimed(self):
+        job = jobs.enqueue(record, 4)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            attempts=1,
+            locked_by='crashed',
+            locked_until=timezone.now() + timedelta(minutes=1),
+        )
+        self.assertIsNone(self.worker.claim())
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        claimed = self.worker.claim()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.locked_by, 'test-worker')
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_local_functions_are_rejected(self):
+        def local():
+            pass
+
+        with self.assertRaises(ValueError):
+            jobs.enqueue(local)
+
+    def test_run_worker_once(self):
+        jobs.enqueue(record, 5)
+        jobs.enqueue(record, 6)
+        stdout = StringIO()
+        call_command('run_worker', once=True, stdout=stdout)
+        self.assertIn('Выполнено задач: 2', stdout.getvalue())
+        self.assertEqual(calls, [(5, None), (6, None)])
+
+    @override_settings(
+        EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+        QUEUED_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    )
+    def test_password_reset_email_is_queued(self):
+        get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='secret'
+        )
+        response = self.client.post(reverse('users:password_reset_form'),
+                                    {'email': 'user@example.com'})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Job.objects.get().name, 'core.mail.send_message')
+
+        self.worker.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+
+    @override_settings(
+        EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+        QUEUED_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    )
+    def test_queued_email_is_stored_as_mime(self):
+        message = mail.EmailMessage(
+            'Тема', 'Текст', 'from@example.com', ['to@example.com'],
+            bcc=['hidden@example.com'],
+        )
+        message.attach('notes.txt', 'Заметки', 'text/plain')
+        message.send()
+        args = json.loads(Job.objects.get().payload)['args']
+        self.assertIn(b'Content-Type: multipart/mixed',
+                      base64.b64decode(args[0]))
+        self.assertEqual(args[1:], [
+            'from@example.com', ['to@example.com', 'hidden@example.com'],
+        ])
+
+        self.worker.run_pending()
+        sent = mail.outbox[0]
+        self.assertEqual(sent.subject, 'Тема')
+        self.assertEqual(sent.recipients(),
+                         ['to@example.com', 'hidden@example.com'])
+        data = sent.message().as_bytes()
+        self.assertIn(b'filename="notes.txt"', data)
+        self.assertNotIn(b'hidden@example.com', data)
+
+    def test_timeline_fan_out_is_queued(self):
+        User = get_user_model()
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(author=author, text='Тестовый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.worker.run_pending()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists()
+        )
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import profiling
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,12 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling_stats(request):
+    """Сводка профилей по вьюхам; POST-запрос её обнуляет."""
+    if request.method == 'POST':
+        profiling.stats.reset()
+    return JsonResponse({'views': profiling.stats.snapshot()},
+                        json_dumps_params={'ensure_ascii': False})
@@ -16,6 +16,22 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_feed()
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == "group":
+            # Список групп в list_editable строится один раз на страницу,
+            # а не отдельным запросом для каждой строки.
+            choices = getattr(request, "_group_choices", None)
+            if choices is None:
+                choices = request._group_choices = list(formfield.choices)
+            formfield.choices = choices
+        return formfield
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,282 @@
+"""JSON API только для чтения.
+
+Списки отдаются страницами с курсорами ``after``/``before``, как ленты
+на сайте (см. ``paginator.CursorPaginator``), размер страницы задаётся
+``?limit=``. Параметр ``?fields=id,text`` оставляет в ответе только
+перечисленные поля; запрос к базе при этом выбирает только нужные
+столбцы и связанные таблицы. Выгрузка ``posts/export/`` отдаётся
+потоком в формате JSON Lines и не держит все посты в памяти.
+"""
+import itertools
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import (Http404, HttpResponseNotAllowed, JsonResponse,
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404
+
+from core.routers import reads_from_replica
+from . import timeline
+from .models import Comment, Group, Post, User
+from .paginator import paginate
+
+MAX_LIMIT = 100
+EXPORT_CHUNK_SIZE = 1000
+LINES_PER_CHUNK = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """Только GET; ошибки — в JSON вместо HTML-страниц сайта."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({"error": "Не найдено"}, status=404)
+        except ApiError as error:
+            return JsonResponse({"error": str(error)}, status=error.status)
+    return reads_from_replica(wrapped)
+
+
+class Field:
+    """Поле ответа: как его получить и какие столбцы для этого нужны."""
+
+    def __init__(self, getter, columns, related=()):
+        self.getter = getter
+        self.columns = columns
+        self.related = related
+
+
+class Serializer:
+    fields = {}
+    # Столбцы, которые нужны всегда, например для курсора пагинации.
+    required_columns = ("id",)
+
+    def __init__(self, names=None):
+        if not names:
+            self.names = list(self.fields)
+            return
+        self.names = list(dict.fromkeys(
+            name.strip() for name in names.split(",") if name.strip()
+        ))
+        unknown = [name for name in self.names if name not in self.fields]
+        if unknown or not self.names:
+            raise ApiError(
+                "Неизвестные поля: " + ", ".join(unknown)
+                if unknown else "Не выбрано ни одного поля"
+            )
+
+    @classmethod
+    def for_request(cls, request):
+        return cls(request.GET.get("fields"))
+
+    def optimize(self, queryset):
+        columns = set(self.required_columns)
+        related = set()
+        for name in self.names:
+            columns.update(self.fields[name].columns)
+            related.update(self.fields[name].related)
+        return queryset.select_related(*sorted(related)).only(
+            *sorted(columns)
+        )
+
+    def to_dict(self, obj):
+        return {name: self.fields[name].getter(obj) for name in self.names}
+
+
+def image_url(post):
+    return post.image.url if post.image else None
+
+
+class PostSerializer(Serializer):
+    fields = {
+        "id": Field(lambda post: post.pk, ("id",)),
+        "text": Field(lambda post: post.text, ("text",)),
+        "pub_date": Field(lambda post: post.pub_date.isoformat(),
+                          ("pub_date",)),
+        "author": Field(lambda post: post.author.username,
+                        ("author", "author__username"), ("author",)),
+        "group": Field(
+            lambda post: post.group.slug if post.group_id else None,
+            ("group", "group__slug"), ("group",),
+        ),
+        "image": Field(image_url, ("image",)),
+        "thumbnails": Field(
+            lambda post: [
+                {key: variant[key]
+                 for key in ("url", "width", "height", "format")}
+                for variant in post.thumbnails
+            ],
+            ("image_variants",),
+        ),
+    }
+    required_columns = ("id", "pub_date")
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        "id": Field(lambda comment: comment.pk, ("id",)),
+        "post": Field(lambda comment: comment.post_id, ("post",)),
+        "author": Field(lambda comment: comment.author.username,
+                        ("author", "author__username"), ("author",)),
+        "text": Field(lambda comment: comment.text, ("text",)),
+        "created": Field(lambda comment: comment.created.isoformat(),
+                         ("created",)),
+    }
+    required_columns = ("id", "created")
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        "id": Field(lambda group: group.pk, ("id",)),
+        "slug": Field(lambda group: group.slug, ("slug",)),
+        "title": Field(lambda group: group.title, ("title",)),
+        "description": Field(lambda group: group.description,
+                             ("description",)),
+    }
+
+
+def get_limit(request):
+    value = request.GET.get("limit")
+    if value is None:
+        return settings.PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError("limit должен быть целым числом")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def page_url(request, **cursor):
+    params = request.GET.copy()
+    for key in ("after", "before", "page"):
+        params.pop(key, None)
+    params.update(cursor)
+    return f"{request.path}?{params.urlencode()}"
+
+
+def page_response(request, queryset, serializer, ordering=None):
+    page = paginate(request, serializer.optimize(queryset),
+                    get_limit(request), ordering)
+    paginator = page.paginator
+    return JsonResponse({
+        "results": [serializer.to_dict(obj) for obj in page],
+        "next": (page_url(request, after=paginator.next_cursor)
+                 if paginator.next_cursor else None),
+        "previous": (page_url(request, before=paginator.previous_cursor)
+                     if paginator.previous_cursor else None),
+    }, json_dumps_params={"ensure_ascii": False})
+
+
+def object_response(obj, serializer):
+    return JsonResponse(serializer.to_dict(obj),
+                        json_dumps_params={"ensure_ascii": False})
+
+
+@api_view
+def posts(request):
+    return page_response(request, Post.objects.all(),
+                         PostSerializer.for_request(request))
+
+
+@api_view
+def post(request, post_id):
+    serializer = PostSerializer.for_request(request)
+    return object_response(
+        get_object_or_404(serializer.optimize(Post.objects.all()),
+                          pk=post_id),
+        serializer,
+    )
+
+
+@api_view
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only("pk"), pk=post_id)
+    return page_response(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        CommentSerializer.for_request(request),
+        ordering=("-created", "-pk"),
+    )
+
+
+@api_view
+def groups(request):
+    return page_response(request, Group.objects.all(),
+                         GroupSerializer.for_request(request),
+                         ordering=("pk",))
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only("pk"), slug=slug)
+    return page_response(request, Post.objects.filter(group=group),
+                         PostSerializer.for_request(request))
+
+
+@api_view
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only("pk"), username=username)
+    return page_response(request, Post.objects.filter(author=author),
+                         PostSerializer.for_request(request))
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        raise ApiError("Нужно войти в аккаунт", status=403)
+    return page_response(request, timeline.followed_posts(request.user),
+                         PostSerializer.for_request(request),
+                         ordering=timeline.FEED_ORDERING)
+
+
+def json_lines(serializer, rows):
+    """Строки JSON Lines, склеенные по ``LINES_PER_CHUNK`` на запись.
+
+    Сервер отправляет каждую часть потокового ответа отдельной записью
+    в сокет, поэтому по одной строке на часть выходит слишком дорого.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = [
+            json.dumps(serializer.to_dict(obj), ensure_ascii=False) + "\n"
+            for obj in itertools.islice(rows, LINES_PER_CHUNK)
+        ]
+        if not chunk:
+            return
+        yield "".join(chunk)
+
+
+@api_view
+def export_posts(request):
+    """Все посты, новые первыми, по одному JSON-объекту на строку.
+
+    Фильтры ``?group=<slug>`` и ``?author=<username>``. Посты читаются
+    пачками через ``iterator``, ответ формируется по мере чтения.
+    """
+    if not request.user.is_authenticated:
+        raise ApiError("Нужно войти в аккаунт", status=403)
+    serializer = PostSerializer.for_request(request)
+    queryset = Post.objects.order_by("-pub_date", "-pk")
+    if "group" in request.GET:
+        queryset = queryset.filter(group__slug=request.GET["group"])
+    if "author" in request.GET:
+        queryset = queryset.filter(author__username=request.GET["author"])
+    rows = serializer.optimize(queryset).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    response = StreamingHttpResponse(
+        json_lines(serializer, rows),
+        content_type="application/x-ndjson; charset=utf-8",
+    )
+    response["Content-Disposition"] = 'attachment; filename="posts.jsonl"'
+    return response
@@ -0,0 +1,169 @@
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core import routers
+
+INDEX_CACHE = "index_page"
+INDEX_VERSION_KEY = "index_page:version"
+
+# Области, у каждой из которых свой счётчик версий:
+# index — главная страница, group/author/post — страницы группы,
+# профиля и поста с данным первичным ключом.
+INDEX = "index_page"
+GROUP = "group"
+AUTHOR = "author"
+POST = "post"
+
+
+def version_key(scope, pk=None):
+    if pk is None:
+        return f"{scope}:version"
+    return f"{scope}:{pk}:version"
+
+
+def get_versions(*scopes):
+    """Текущие версии областей ``(scope, pk)`` за одно обращение к кэшу.
+
+    Версия входит в ключ каждого фрагмента и в ETag страницы, поэтому
+    её смена делает недоступными все закэшированные копии сразу. Если
+    счётчик вытеснен из кэша, новый отсчёт начинается с текущего
+    времени, чтобы не совпасть со старыми ключами.
+    """
+    cache = caches[INDEX_CACHE]
+    keys = [version_key(*scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_version(scope, pk=None):
+    return get_versions((scope, pk))[0]
+
+
+def bump_version(scope, pk=None):
+    """Меняет версию области после фиксации текущей транзакции.
+
+    Если сменить версию раньше, параллельный запрос успеет отрисовать
+    ещё не зафиксированные данные под новой версией, и устаревший
+    фрагмент с ETag проживут до следующей записи. Вне транзакции версия
+    меняется сразу.
+    """
+    transaction.on_commit(partial(incr_version, scope, pk))
+
+
+def incr_version(scope, pk=None):
+    cache = caches[INDEX_CACHE]
+    key = version_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_post_scopes(post_id, author_id, group_id=None):
+    """Сбрасывает все страницы, на которых выводится пост."""
+    bump_version(INDEX)
+    bump_version(POST, post_id)
+    bump_version(AUTHOR, author_id)
+    if group_id is not None:
+        bump_version(GROUP, group_id)
+
+
+def bump_posts_scopes(posts):
+    """Сбрасывает страницы постов из троек ``(post_id, author_id,
+    group_id)``; общие для них профили и группы — по одному разу."""
+    bump_version(INDEX)
+    author_ids, group_ids = set(), set()
+    for post_id, author_id, group_id in posts:
+        bump_version(POST, post_id)
+        author_ids.add(author_id)
+        group_ids.add(group_id)
+    for author_id in author_ids:
+        bump_version(AUTHOR, author_id)
+    for group_id in group_ids - {None}:
+        bump_version(GROUP, group_id)
+
+
+def get_index_version():
+    return get_version(INDEX)
+
+
+def bump_index_version():
+    bump_version(INDEX)
+
+
+def etags_enabled():
+    """Можно ли выдать ETag по версиям областей.
+
+    Без общего кэша версию, сменённую в одном процессе, другие не
+    увидят. Страница с отстающей реплики может не содержать того, что
+    уже учтено в версии, и клиент хранил бы её до следующей записи.
+    """
+    return settings.PAGE_CACHE_SHARED and not routers.replica_reads()
+
+
+def read_source():
+    """Часть ключа кэша: фрагменты с реплики и с основной базы разные."""
+    return "replica" if routers.replica_reads() else "primary"
+
+
+def make_etag(request, *scopes):
+    """ETag страницы: версии областей, пользователь и параметры запроса.
+
+    Пользователь входит в ETag, потому что шапка и кнопки страниц
+    зависят от того, кто их смотрит. Когда ETag нельзя доверять (см.
+    ``etags_enabled``), возвращает None.
+    """
+    if not etags_enabled():
+        return None
+    parts = [str(version) for version in get_versions(*scopes)]
+    parts.append(str(request.user.pk or 0))
+    parts.append(request.GET.urlencode())
+    return hashlib.md5(":".join(parts).encode()).hexdigest()
+
+
+def page_cache_key(request, *scopes):
+    """Ключ фрагмента: версии областей, страница и вид для пользователя.
+
+    Фрагменты не удаляются явно: после смены версии старые ключи просто
+    перестают запрашиваться и вытесняются из кэша по сроку жизни.
+    Пользователь, закреплённый за основной базой после записи, не
+    получит фрагмент, отрисованный по отстающей реплике.
+    """
+    return ":".join((
+        *(str(version) for version in get_versions(*scopes)),
+        read_source(),
+        str(int(request.user.is_authenticated)),
+        request.GET.get("page", ""),
+        request.GET.get("after", ""),
+        request.GET.get("before", ""),
+    ))
+
+
+def index_cache_key(request):
+    return page_cache_key(request, (INDEX, None))
+
+
+def page_cache_timeout():
+    """Срок жизни фрагмента.
+
+    Фрагмент с реплики мог быть отрисован до того, как до неё дошли
+    изменения, уже учтённые в версии; он живёт не дольше, чем
+    пользователь после записи закреплён за основной базой.
+    """
+    timeout = caches[INDEX_CACHE].default_timeout
+    if not settings.PAGE_CACHE_SHARED:
+        timeout = settings.PAGE_CACHE_LOCAL_TIMEOUT
+    if routers.replica_reads() and (
+        timeout is None or timeout > settings.REPLICA_PIN_SECONDS
+    ):
+        timeout = settings.REPLICA_PIN_SECONDS
+    return timeout
@@ -0,0 +1,169 @@
+"""Ленты RSS и Atom: все посты, посты группы и посты автора.
+
+Готовый XML ленты хранится в кэше страниц под ключом с версией её
+области (см. ``caching``), а ETag ответа строится из того же ключа.
+Повторный опрос программой чтения лент стоит одного обращения к кэшу:
+при совпадении ETag отдаётся 304, иначе — сохранённый XML. Группу и
+автора для их лент при этом ещё ищут в базе по слагу или имени.
+
+Заголовок Last-Modified не отдаётся: это была бы дата самого свежего
+поста, а она не меняется при правке или удалении постов, и запрос с
+If-Modified-Since получал бы 304 на изменённую ленту. В XML ссылки
+абсолютные, поэтому адрес сайта из запроса тоже входит в ключ.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import quote_etag
+from django.utils.text import Truncator
+
+from core.routers import reads_from_replica
+from . import caching
+from .models import Post
+from .views import get_author, get_group
+
+
+class LatestPostsFeed(Feed):
+    title = "Yatube: последние записи"
+    description = "Новые посты всех авторов"
+
+    def link(self):
+        return reverse("posts:index")
+
+    def items(self):
+        return Post.objects.for_feed()[:settings.FEED_SIZE]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(8)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse("posts:post_detail", kwargs={"post_id": post.pk})
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group_id else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_group(request, slug)
+
+    def title(self, group):
+        return f"Yatube: {group.title}"
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse("posts:group_list", kwargs={"slug": group.slug})
+
+    def items(self, group):
+        return group.posts.for_feed()[:settings.FEED_SIZE]
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_author(request, username)
+
+    def title(self, author):
+        return f"Yatube: {author.get_full_name() or author.username}"
+
+    def description(self, author):
+        return f"Посты пользователя {author.username}"
+
+    def link(self, author):
+        return reverse("posts:profile", kwargs={"username": author.username})
+
+    def items(self, author):
+        return author.posts.for_feed()[:settings.FEED_SIZE]
+
+
+class AtomLatestPostsFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class AtomGroupPostsFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return self.description(group)
+
+
+class AtomAuthorPostsFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
+
+
+def index_scope(request):
+    return caching.INDEX, None
+
+
+def group_scope(request, slug):
+    return caching.GROUP, get_group(request, slug).pk
+
+
+def author_scope(request, username):
+    return caching.AUTHOR, get_author(request, username).pk
+
+
+def cached_feed(feed_class, scope):
+    """Вьюха ленты с кэшированием XML и условными GET-запросами.
+
+    ``scope(request, **kwargs)`` возвращает область ``(scope, pk)``,
+    с версией которой меняется содержимое ленты.
+    """
+    feed = feed_class()
+    name = feed_class.__name__
+
+    def view(request, **kwargs):
+        scope_name, pk = scope(request, **kwargs)
+        version = caching.get_version(scope_name, pk)
+        key = (f"feed:{name}:{scope_name}:{pk}:{version}:"
+               f"{caching.read_source()}:"
+               f"{request.scheme}://{request.get_host()}")
+        etag = None
+        if caching.etags_enabled():
+            etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+        cache = caches[caching.INDEX_CACHE]
+        entry = cache.get(key)
+        if entry is None:
+            response = feed(request, **kwargs)
+            entry = (response.content, response["Content-Type"])
+            cache.set(key, entry, caching.page_cache_timeout())
+        content, content_type = entry
+
+        response = HttpResponse(content, content_type=content_type)
+        if etag:
+            response["ETag"] = etag
+        return response
+
+    return reads_from_replica(view)
+
+
+latest_rss = cached_feed(LatestPostsFeed, index_scope)
+latest_atom = cached_feed(AtomLatestPostsFeed, index_scope)
+group_rss = cached_feed(GroupPostsFeed, group_scope)
+group_atom = cached_feed(AtomGroupPostsFeed, group_scope)
+author_rss = cached_feed(AuthorPostsFeed, author_scope)
+author_atom = cached_feed(AtomAuthorPostsFeed, author_scope)
@@ -1,8 +1,19 @@
+import os
+import tempfile
+
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            UploadedFile)
 from django.forms import ModelForm
+from django.template.defaultfilters import filesizeformat
 
+from . import imaging
 from .models import Comment, Post
 
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+
 
 class PostForm(ModelForm):
     class Meta:
@@ -17,6 +28,49 @@ class PostForm(ModelForm):
             "image": "Картинка",
         }
 
+    def __init__(self, *args, upload_limit_exceeded=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_limit_exceeded = upload_limit_exceeded
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.upload_limit_exceeded:
+            limit = filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+            self.add_error(
+                "image", f"Размер картинки не должен превышать {limit}"
+            )
+        return cleaned_data
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        if not isinstance(image, UploadedFile):
+            return image
+        image.seek(0)
+        width, height = imaging.read_size(image)
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError("Слишком большое разрешение картинки")
+        return self.normalize_image(image)
+
+    def normalize_image(self, image):
+        """Перекодирует картинку; большие файлы уходят на диск."""
+        buffer = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        image.seek(0)
+        image_format = imaging.normalize(
+            image, buffer, settings.POST_IMAGE_MAX_SIDE
+        )
+        name = image.name
+        root, ext = os.path.splitext(name)
+        if ext.lower() not in (EXTENSIONS[image_format], ".jpeg"):
+            name = root + EXTENSIONS[image_format]
+        size = buffer.tell()
+        buffer.seek(0)
+        return InMemoryUploadedFile(
+            buffer, "image", name, f"image/{image_format.lower()}", size,
+            None,
+        )
+
 
 class CommentForm(ModelForm):
     class Meta:
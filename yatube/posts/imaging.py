@@ -0,0 +1,77 @@
+"""Обработка картинок постов.
+
+Модуль не зависит от Django: его функции выполняются в процессах
+пула, куда передаются только пути к файлам и размеры.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+# Форматы, которые сохраняются как есть; остальные перекодируются в PNG.
+UPLOAD_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "WEBP": {"quality": 80, "method": 4},
+    "AVIF": {"quality": 60},
+}
+
+
+def available_formats(formats):
+    """Форматы из ``formats``, которые умеет сохранять Pillow."""
+    Image.init()
+    return [name for name in formats if name in Image.SAVE]
+
+
+def render_variants(source_path, targets):
+    """Строит все варианты картинки за одно чтение исходника.
+
+    ``targets`` — список кортежей ``(target_path, width, height,
+    image_format)``. Из центра картинки вырезается область нужных
+    пропорций и масштабируется до ``width`` x ``height``; каждый размер
+    масштабируется один раз и сохраняется во всех нужных форматах.
+    Возвращает фактические размеры вариантов.
+    """
+    with Image.open(source_path) as image:
+        image = image.convert("RGB")
+    resized = {}
+    sizes = []
+    for target_path, width, height, image_format in targets:
+        if (width, height) not in resized:
+            resized[width, height] = ImageOps.fit(
+                image, (width, height), Image.LANCZOS
+            )
+        variant = resized[width, height]
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        variant.save(target_path, image_format,
+                     **SAVE_OPTIONS.get(image_format, {}))
+        sizes.append(variant.size)
+    return sizes
+
+
+def read_size(source):
+    """Размер картинки по заголовку файла, без декодирования пикселей."""
+    with Image.open(source) as image:
+        return image.size
+
+
+def normalize(source, target, max_side):
+    """Перекодирует загруженную картинку один раз.
+
+    Картинка поворачивается по EXIF-ориентации и уменьшается так, чтобы
+    большая сторона не превышала ``max_side``. Метаданные (EXIF, GPS)
+    при сохранении не переносятся. JPEG декодируется сразу в уменьшенном
+    масштабе. Возвращает формат, в котором сохранён ``target``.
+    """
+    with Image.open(source) as image:
+        image_format = image.format
+        image.draft(image.mode, (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image_format not in UPLOAD_FORMATS:
+        image_format = "PNG"
+        if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+            image = image.convert("RGBA")
+    image.save(target, image_format,
+               **SAVE_OPTIONS.get(image_format, {}))
+    return image_format
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from posts import sitemaps
+
+
+class Command(BaseCommand):
+    help = "Строит файлы карты сайта для постов, групп и профилей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--site-url",
+            help="Адрес сайта для ссылок в карте, по умолчанию SITE_URL",
+        )
+        parser.add_argument(
+            "--shard-size",
+            type=int,
+            default=sitemaps.SHARD_SIZE,
+            help="Сколько адресов в одном файле карты (не больше 50000)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=sitemaps.CHUNK_SIZE,
+            help="Сколько строк читать из базы за раз",
+        )
+
+    def handle(self, *args, **options):
+        shards = sitemaps.build(
+            site_url=options["site_url"],
+            shard_size=min(options["shard_size"], sitemaps.SHARD_SIZE),
+            chunk_size=options["chunk_size"],
+        )
+        if options["verbosity"] > 1:
+            for name, count, _ in shards:
+                self.stdout.write(f"{name}: {count}")
+        total = sum(count for _, count, _ in shards)
+        self.stdout.write(self.style.SUCCESS(
+            f"Адресов в карте: {total}, файлов: {len(shards)}"
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = "Удаляет картинки постов и их варианты, на которые нет ссылок"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать файлы, которые будут удалены",
+        )
+
+    def handle(self, *args, **options):
+        images, variants = media.collect_garbage(dry_run=options["dry_run"])
+        if options["verbosity"] > 1:
+            for name in images + variants:
+                self.stdout.write(name)
+        action = "Будет удалено" if options["dry_run"] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} картинок: {len(images)}, вариантов: {len(variants)}"
+        ))
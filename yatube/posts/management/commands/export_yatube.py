@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ("Выгружает пользователей, группы, посты, комментарии и "
+            "подписки в файл JSON Lines")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл выгрузки; .gz — со сжатием")
+        parser.add_argument("--gzip", action="store_true", default=None,
+                            help="Сжать файл независимо от расширения")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=transfer.CHUNK_SIZE,
+            help="Сколько строк читать из базы за раз",
+        )
+
+    def handle(self, *args, **options):
+        counts = transfer.export(
+            options["path"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+            log=self.progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Выгружено: " + ", ".join(
+                f"{kind} {count}" for kind, count in counts.items()
+            )
+        ))
+
+    def progress(self, kind, count):
+        self.stdout.write(f"{kind}: {count}")
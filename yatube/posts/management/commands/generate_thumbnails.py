@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Строит варианты картинок постов, у которых их ещё нет"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Перестроить варианты картинок всех постов",
+        )
+
+    def handle(self, *args, **options):
+        if not options["all"]:
+            # Посты, которые пропустили сигналы или чьи варианты не успел
+            # построить завершившийся процесс.
+            total = thumbnails.build_missing()
+            self.stdout.write(self.style.SUCCESS(
+                f"Построены варианты картинок постов: {total}"
+            ))
+            return
+        posts = Post.objects.exclude(image="").order_by("pk")
+        variant_specs = thumbnails.specs()
+        total = 0
+        for post_id, image_name in posts.values_list("pk", "image").iterator():
+            # Команда сама является фоновой работой, поэтому пул
+            # процессов здесь не нужен.
+            thumbnails.store(
+                post_id,
+                image_name,
+                variant_specs,
+                thumbnails.render(image_name, variant_specs),
+            )
+            total += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Построены варианты картинок постов: {total}")
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = "Загружает файл, созданный командой export_yatube"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл выгрузки; .gz — со сжатием")
+        parser.add_argument("--gzip", action="store_true", default=None,
+                            help="Файл сжат независимо от расширения")
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл контрольной точки, по умолчанию <path>.checkpoint",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Начать заново, не продолжая прерванную загрузку",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=transfer.CHUNK_SIZE,
+            help="Сколько записей вставлять за одну транзакцию",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"] or options["path"] + ".checkpoint"
+        if options["restart"]:
+            transfer.Checkpoint(checkpoint).remove()
+        counts = transfer.load(
+            options["path"],
+            compress=options["gzip"],
+            checkpoint_path=checkpoint,
+            batch_size=options["batch_size"],
+            log=self.progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Загружено: " + ", ".join(
+                f"{kind} {count}" for kind, count in counts.items()
+            )
+        ))
+
+    def progress(self, kind, count):
+        self.stdout.write(f"{kind}: {count}")
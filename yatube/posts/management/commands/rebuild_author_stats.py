@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import AuthorStats, User
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики постов, комментариев и подписок авторов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Сколько пользователей пересчитывать за одну транзакцию",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+        batch = []
+        total = 0
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) == batch_size:
+                AuthorStats.objects.rebuild(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            AuthorStats.objects.rebuild(batch)
+            total += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересчитано пользователей: {total}")
+        )
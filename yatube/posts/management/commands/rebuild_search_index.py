@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = "Строит заново поисковый индекс постов и комментариев"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Сколько постов индексировать за один запрос",
+        )
+
+    def handle(self, *args, **options):
+        total = search.rebuild(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Проиндексировано постов: {total}")
+        )
@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import seeding
+
+STEPS = {
+    "users": "Пользователей",
+    "groups": "Групп",
+    "posts": "Постов",
+    "comments": "Комментариев",
+    "follows": "Подписок",
+    "stats": "Пересчитано счётчиков",
+    "timelines": "Записей в лентах",
+    "search": "Проиндексировано постов",
+    "thumbnails": "Построены варианты картинок постов",
+}
+
+
+class Command(BaseCommand):
+    help = "Заполняет базу синтетическими данными для нагрузочных тестов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000,
+                            help="Сколько создать пользователей")
+        parser.add_argument("--groups", type=int, default=20,
+                            help="Сколько создать групп")
+        parser.add_argument("--posts", type=int, default=10000,
+                            help="Сколько создать постов")
+        parser.add_argument("--comments", type=int, default=20000,
+                            help="Сколько создать комментариев")
+        parser.add_argument("--follows", type=int, default=10000,
+                            help="Сколько создать подписок")
+        parser.add_argument(
+            "--image-share",
+            type=float,
+            default=0.0,
+            help="Доля постов с картинкой, от 0 до 1",
+        )
+        parser.add_argument("--days", type=int, default=365,
+                            help="За сколько дней распределить посты")
+        parser.add_argument(
+            "--password",
+            help="Пароль всех пользователей; без него вход недоступен",
+        )
+        parser.add_argument("--seed", type=int,
+                            help="Зерно генератора для повторяемых данных")
+        parser.add_argument(
+            "--skip-search-index",
+            action="store_true",
+            help="Не индексировать новые посты для поиска",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=seeding.BATCH_SIZE,
+            help="Сколько строк вставлять за одну транзакцию",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def log(step, count):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{STEPS[step]}: {count} ({elapsed:.1f} с)")
+
+        seeding.seed(
+            users=options["users"],
+            groups=options["groups"],
+            posts=options["posts"],
+            comments=options["comments"],
+            follows=options["follows"],
+            image_share=options["image_share"],
+            days=options["days"],
+            password=options["password"],
+            seed=options["seed"],
+            index=not options["skip_search_index"],
+            batch_size=options["batch_size"],
+            log=log,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.monotonic() - started:.1f} с"
+        ))
@@ -0,0 +1,96 @@
+"""Подсчёт ссылок на картинки постов и удаление осиротевших файлов.
+
+Ссылки на картинку — это посты, у которых она указана в ``image``;
+отдельного счётчика нет, поэтому он не может разойтись с данными.
+"""
+import os
+import posixpath
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+
+from . import thumbnails
+from .models import Post
+
+
+def storage():
+    return Post.image.field.storage
+
+
+def references(image_name):
+    return Post.objects.filter(image=image_name).count()
+
+
+def release(image_name):
+    """Удаляет картинку и её варианты, если на неё больше нет ссылок.
+
+    Недавно записанные файлы оставляются сборщику мусора: на них может
+    ссылаться пост из ещё не зафиксированной транзакции.
+    """
+    try:
+        if not image_name or not storage().exists(image_name):
+            return False
+    except SuspiciousFileOperation:
+        # Файл вне MEDIA_ROOT хранилище не удаляет.
+        return False
+    if storage().is_recent(image_name) or references(image_name):
+        return False
+    storage().delete(image_name)
+    thumbnails.delete_variants(image_name)
+    return True
+
+
+def walk(file_storage, directory):
+    """Имена всех файлов в ``directory`` и его подкаталогах."""
+    if not file_storage.exists(directory):
+        return
+    directories, files = file_storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk(file_storage, posixpath.join(directory, name))
+
+
+def remove_empty_dirs(file_storage, directory):
+    if not file_storage.exists(directory):
+        return
+    top = file_storage.path(directory)
+    for root, _, _ in os.walk(top, topdown=False):
+        if root == top:
+            continue
+        try:
+            # Непустой каталог не удалится, это и нужно.
+            os.rmdir(root)
+        except OSError:
+            pass
+
+
+def collect_garbage(dry_run=False):
+    """Удаляет картинки без ссылок и варианты удалённых картинок.
+
+    Возвращает пару списков: удалённые картинки и удалённые варианты.
+    """
+    upload_to = Post.image.field.upload_to.rstrip("/")
+    referenced = set(
+        Post.objects.exclude(image="")
+        .values_list("image", flat=True)
+        .iterator()
+    )
+    images = [
+        name for name in walk(storage(), upload_to)
+        if name not in referenced and not storage().is_recent(name)
+    ]
+    roots = {posixpath.splitext(name)[0] for name in referenced}
+    prefix = thumbnails.variant_dir("")
+    variants = [
+        name for name in walk(default_storage, prefix + upload_to)
+        if posixpath.dirname(name)[len(prefix):] not in roots
+    ]
+    if not dry_run:
+        for name in images:
+            storage().delete(name)
+        for name in variants:
+            default_storage.delete(name)
+        remove_empty_dirs(storage(), upload_to)
+        remove_empty_dirs(default_storage, prefix + upload_to)
+    return images, variants
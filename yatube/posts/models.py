@@ -1,5 +1,15 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils.functional import cached_property
+
+from .storage import post_images
 
 User = get_user_model()
 
@@ -19,6 +29,14 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа подгружаются тем же запросом."""
+        return self.select_related("author", "group").defer(
+            "group__description"
+        )
+
+
 class Post(models.Model):
     text = models.TextField("Текст поста",
                             blank=False,
@@ -46,16 +64,74 @@ class Post(models.Model):
         help_text="Выберите группу",
     )
 
-    image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    image = models.ImageField(
+        "Картинка", upload_to="posts/", storage=post_images, blank=True
+    )
+    image_variants = models.TextField(
+        "Миниатюры картинки",
+        blank=True,
+        default="",
+        editable=False,
+        help_text="Готовые миниатюры в формате JSON",
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        indexes = [
+            models.Index(fields=["-pub_date"], name="post_pub_date_idx"),
+            models.Index(
+                fields=["author", "-pub_date"], name="post_author_pub_date_idx"
+            ),
+            models.Index(
+                fields=["group", "-pub_date"], name="post_group_pub_date_idx"
+            ),
+            models.Index(fields=["image"], name="post_image_idx"),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @cached_property
+    def thumbnails(self):
+        """Готовые варианты картинки: размеры и форматы."""
+        variants = json.loads(self.image_variants or "[]")
+        for variant in variants:
+            variant["url"] = default_storage.url(variant["name"])
+        return variants
+
+    @property
+    def thumbnail(self):
+        """JPEG-вариант основного размера для ``<img src>``."""
+        for variant in self.thumbnails:
+            if (variant["geometry"] == settings.POST_THUMBNAIL_GEOMETRY
+                    and variant["format"] == "JPEG"):
+                return variant
+        return None
+
+    @property
+    def picture(self):
+        """Данные для разметки ``<picture>`` со ``srcset`` по форматам."""
+        if self.thumbnail is None:
+            return None
+        srcsets = {}
+        for variant in self.thumbnails:
+            srcsets.setdefault(variant["format"], []).append(
+                f"{variant['url']} {variant['width']}w"
+            )
+        return {
+            "img": self.thumbnail,
+            "srcset": ", ".join(srcsets.pop("JPEG")),
+            "sources": [
+                {"type": f"image/{image_format.lower()}",
+                 "srcset": ", ".join(srcset)}
+                for image_format, srcset in srcsets.items()
+            ],
+        }
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -88,6 +164,11 @@ class Comment(models.Model):
         ordering = ["-created"]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(
+                fields=["post", "-created"], name="comment_post_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -115,6 +196,153 @@ class Follow(models.Model):
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_follow"
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F("author")),
+                name="prevent_self_follow",
+            ),
+        ]
 
     def __str__(self):
         return str(self.author)
+
+
+class TimelineEntry(models.Model):
+    #  чья лента
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        verbose_name="Пользователь",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Пост",
+    )
+    # Копия даты поста: лента пользователя читается по индексу этой
+    # таблицы, без сортировки постов.
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"],
+                name="timeline_user_pub_date_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.post}"
+
+
+class AuthorStatsQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Счётчики пользователя; для новых пользователей — нулевые."""
+        try:
+            return user.stats
+        except ObjectDoesNotExist:
+            return self.model(user=user)
+
+    def increment(self, user_id, field, delta=1):
+        # У подписки автор может быть не указан: считать некому.
+        if user_id is None:
+            return
+        with transaction.atomic():
+            self.get_or_create(user_id=user_id)
+            self.filter(user_id=user_id).update(**{field: F(field) + delta})
+
+    def rebuild(self, user_ids):
+        """Пересчитывает счётчики пользователей по данным таблиц."""
+        stats = {pk: self.model(user_id=pk) for pk in user_ids}
+        for field, (model, key) in STATS_SOURCES.items():
+            rows = (
+                model.objects.filter(**{f"{key}__in": user_ids})
+                .order_by()
+                .values_list(key)
+                .annotate(models.Count("pk"))
+            )
+            for user_id, count in rows:
+                setattr(stats[user_id], field, count)
+        with transaction.atomic():
+            self.filter(user_id__in=user_ids).delete()
+            self.bulk_create(stats.values())
+
+    def decrement(self, user_id, field, delta=1):
+        # Строку не создаём: при каскадном удалении пользователя она
+        # уже удалена вместе с ним.
+        if user_id is None:
+            return
+        self.filter(user_id=user_id).update(
+            **{field: Greatest(F(field) - delta, 0)}
+        )
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Пользователь",
+    )
+    posts_count = models.PositiveIntegerField("Постов", default=0)
+    comments_count = models.PositiveIntegerField("Комментариев", default=0)
+    followers_count = models.PositiveIntegerField("Подписчиков", default=0)
+    following_count = models.PositiveIntegerField("Подписок", default=0)
+
+    objects = AuthorStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+
+    def __str__(self):
+        return str(self.user)
+
+
+class SearchPosting(models.Model):
+    """Запись инвертированного индекса: слово встречается в посте.
+
+    Используется, когда база не поддерживает FTS5 (см. ``posts.search``).
+    """
+
+    term = models.CharField("Слово", max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="search_postings",
+        verbose_name="Пост",
+    )
+    weight = models.PositiveIntegerField("Вес", default=0)
+
+    class Meta:
+        verbose_name = "Запись поискового индекса"
+        verbose_name_plural = "Записи поискового индекса"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["term", "post"], name="unique_search_posting"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.term}: {self.post_id}"
+
+
+STATS_SOURCES = {
+    "posts_count": (Post, "author"),
+    "comments_count": (Comment, "author"),
+    "followers_count": (Follow, "author"),
+    "following_count": (Follow, "user"),
+}
@@ -0,0 +1,206 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу сортировки вместо COUNT(*) и OFFSET.
+
+    Соседние страницы адресуются непрозрачными токенами ``after`` и
+    ``before``, в которых закодированы значения полей сортировки
+    граничной записи, поэтому стоимость запроса не зависит от глубины
+    страницы. Номер страницы (``?page=``) поддерживается для старых
+    ссылок, но ``count`` при этом не вычисляется.
+    """
+
+    ordering = ("-pub_date", "-pk")
+
+    def __init__(self, object_list, per_page, ordering=None):
+        if ordering:
+            self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.has_more = False
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._number = 1
+
+    @property
+    def num_pages(self):
+        # Общее число страниц неизвестно: пагинатор знает только,
+        # есть ли страница после текущей.
+        return self._number + int(self.has_more)
+
+    def page(self, number):
+        return self.get_page(number)
+
+    def get_page(self, number=None, after=None, before=None):
+        after = self.decode_cursor(after)
+        if after is not None:
+            return self._page_after(after)
+        before = self.decode_cursor(before)
+        if before is not None:
+            page = self._page_before(before)
+            if page is not None:
+                return page
+        return self._page_number(number)
+
+    def encode_cursor(self, obj):
+        values = [
+            self._cursor_value(obj, name) for name in self._field_names()
+        ]
+        data = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(data.decode())
+            if len(values) != len(self.ordering):
+                return None
+            return [
+                self._get_field(name).to_python(value)
+                for name, value in zip(self._field_names(), values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+                ValidationError):
+            return None
+
+    def _field_names(self):
+        return [field.lstrip("-") for field in self.ordering]
+
+    def _get_field(self, name):
+        # Сортировать можно и по аннотации, например по дате записи ленты.
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        opts = self.object_list.model._meta
+        return opts.pk if name == "pk" else opts.get_field(name)
+
+    def _cursor_value(self, obj, name):
+        if name not in self.object_list.query.annotations:
+            return self._get_field(name).value_to_string(obj)
+        value = getattr(obj, name)
+        return value.isoformat() if hasattr(value, "isoformat") else value
+
+    def _keyset_filter(self, values, reverse=False):
+        names = self._field_names()
+        query = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith("-") != reverse
+            lookup = "lt" if descending else "gt"
+            condition = Q(**{f"{names[index]}__{lookup}": values[index]})
+            for name, value in zip(names[:index], values):
+                condition &= Q(**{name: value})
+            query |= condition
+        return query
+
+    def _reversed_ordering(self):
+        return [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+
+    def _page_number(self, number):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * self.per_page
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            return self._page_number(1)
+        return self._make_page(rows, number, has_previous=number > 1)
+
+    def _page_after(self, values):
+        queryset = self.object_list.filter(self._keyset_filter(values))
+        rows = list(queryset[:self.per_page + 1])
+        return self._make_page(rows, 2, has_previous=True)
+
+    def _page_before(self, values):
+        queryset = self.object_list.filter(
+            self._keyset_filter(values, reverse=True)
+        ).order_by(*self._reversed_ordering())
+        rows = list(queryset[:self.per_page + 1])
+        if not rows:
+            return None
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        page = self._make_page(rows, 2 if has_previous else 1, has_previous)
+        self.has_more = True
+        self.next_cursor = self.encode_cursor(rows[-1])
+        return page
+
+    def _make_page(self, rows, number, has_previous):
+        self.has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        self._number = number
+        self.next_cursor = (
+            self.encode_cursor(rows[-1]) if self.has_more else None
+        )
+        self.previous_cursor = (
+            self.encode_cursor(rows[0]) if has_previous and rows else None
+        )
+        return Page(rows, number, self)
+
+
+class RankedPaginator(Paginator):
+    """Постраничный вывод результатов, упорядоченных не по полям модели.
+
+    ``fetch(offset, limit)`` возвращает срез результатов; следующая
+    страница определяется по лишней записи, без ``count``.
+    """
+
+    def __init__(self, fetch, per_page):
+        super().__init__([], per_page)
+        self.fetch = fetch
+        self.has_more = False
+        self._number = 1
+
+    @property
+    def num_pages(self):
+        return self._number + int(self.has_more)
+
+    def page(self, number):
+        return self.get_page(number)
+
+    def get_page(self, number=None):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        rows = self.fetch((number - 1) * self.per_page, self.per_page + 1)
+        if not rows and number > 1:
+            return self.get_page(1)
+        self.has_more = len(rows) > self.per_page
+        self._number = number
+        return Page(rows[:self.per_page], number, self)
+
+
+def paginate(request, queryset, per_page=None, ordering=None):
+    """Возвращает страницу ``queryset`` по параметрам запроса."""
+    paginator = CursorPaginator(
+        queryset, per_page or settings.PAGE_SIZE, ordering
+    )
+    return paginator.get_page(
+        request.GET.get("page"),
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
+
+
+def lazy_paginate(request, queryset, per_page=None, ordering=None):
+    """Как ``paginate``, но страница загружается при первом обращении.
+
+    Если фрагмент со списком взят из кэша, запросы к базе не выполняются.
+    """
+    return SimpleLazyObject(
+        lambda: paginate(request, queryset, per_page, ordering)
+    )
@@ -0,0 +1,271 @@
+"""Полнотекстовый поиск по постам и комментариям к ним.
+
+Документ индекса — пост: его текст и тексты всех комментариев. Индекс
+обновляется в той же транзакции, что и данные (см. ``signals``). Новый
+комментарий дописывается к документу, а не пересобирает его из всех
+комментариев поста.
+
+На SQLite со сборкой FTS5 индекс хранится в виртуальной таблице
+``posts_search``, а релевантность считает BM25. На других базах
+используется собственный инвертированный индекс ``SearchPosting``
+с ранжированием TF-IDF. Оба варианта ищут посты, содержащие все слова
+запроса, без учёта регистра и диакритики («ё» и «е» не различаются).
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from .models import Comment, Post, SearchPosting
+
+FTS_TABLE = "posts_search"
+TERM_MAX_LENGTH = SearchPosting._meta.get_field("term").max_length
+TOKEN_RE = re.compile(r"[^\W_]+")
+# Совпадение в тексте поста весит больше, чем в комментарии.
+TEXT_WEIGHT = 2
+COMMENTS_WEIGHT = 1
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token[:TERM_MAX_LENGTH] for token in TOKEN_RE.findall(text)]
+
+
+# Есть ли FTS5 в сборке SQLite, по псевдонимам баз: сборка не меняется,
+# пока процесс жив, а спрашивать её на каждое сохранение дорого.
+_fts5_available = {}
+
+
+def fts5_available(db=None):
+    db = db or connection
+    if db.vendor != "sqlite":
+        return False
+    if db.alias not in _fts5_available:
+        with db.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            _fts5_available[db.alias] = (
+                ("ENABLE_FTS5",) in cursor.fetchall()
+            )
+    return _fts5_available[db.alias]
+
+
+def get_backend():
+    name = settings.POSTS_SEARCH_BACKEND
+    if name is None:
+        name = "fts5" if fts5_available() else "python"
+    return BACKENDS[name]
+
+
+class FTS5Backend:
+    def update(self, documents):
+        # Токенизатор unicode61 снимает диакритику только с латиницы,
+        # поэтому в индекс пишутся уже нормализованные слова.
+        rows = [
+            (post_id, " ".join(tokenize(text)), " ".join(tokenize(comments)))
+            for post_id, text, comments in documents
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [(post_id,) for post_id, _, _ in documents],
+            )
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, text, comments) "
+                f"VALUES (%s, %s, %s)",
+                rows,
+            )
+
+    def add_comment(self, post_id, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET comments = comments || ' ' || %s "
+                f"WHERE rowid = %s",
+                [" ".join(terms), post_id],
+            )
+
+    def remove_comment(self, post_id, terms):
+        # Вычеркнуть слова одного комментария из столбца нельзя, не
+        # зная их границ, поэтому документ собирается заново.
+        self.update(documents(
+            Post.objects.filter(pk=post_id).values_list("pk", "text")
+        ))
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post_id]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def search(self, terms, offset, limit):
+        match = " ".join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, %s, %s), rowid DESC "
+                f"LIMIT %s OFFSET %s",
+                [match, TEXT_WEIGHT, COMMENTS_WEIGHT, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PythonBackend:
+    def update(self, documents):
+        postings = []
+        for post_id, text, comments in documents:
+            weights = Counter()
+            for term in tokenize(text):
+                weights[term] += TEXT_WEIGHT
+            for term in tokenize(comments):
+                weights[term] += COMMENTS_WEIGHT
+            postings.extend(
+                SearchPosting(term=term, post_id=post_id, weight=weight)
+                for term, weight in weights.items()
+            )
+        SearchPosting.objects.filter(
+            post_id__in=[post_id for post_id, _, _ in documents]
+        ).delete()
+        SearchPosting.objects.bulk_create(postings, batch_size=500)
+
+    def add_comment(self, post_id, terms):
+        self.shift(post_id, terms, COMMENTS_WEIGHT)
+
+    def remove_comment(self, post_id, terms):
+        self.shift(post_id, terms, -COMMENTS_WEIGHT)
+        SearchPosting.objects.filter(post_id=post_id, weight__lte=0).delete()
+
+    def shift(self, post_id, terms, weight):
+        """Меняет веса слов документа на ``weight`` за каждое вхождение."""
+        weights = {
+            term: count * weight for term, count in Counter(terms).items()
+        }
+        postings = SearchPosting.objects.filter(post_id=post_id)
+        existing = set(postings.filter(term__in=weights).values_list(
+            "term", flat=True
+        ))
+        # Одним UPDATE сдвигаются все слова с одинаковым сдвигом.
+        terms_by_delta = defaultdict(list)
+        for term in existing:
+            terms_by_delta[weights[term]].append(term)
+        for delta, delta_terms in terms_by_delta.items():
+            postings.filter(term__in=delta_terms).update(
+                weight=F("weight") + delta
+            )
+        SearchPosting.objects.bulk_create(
+            [SearchPosting(term=term, post_id=post_id, weight=delta)
+             for term, delta in weights.items()
+             if term not in existing and delta > 0],
+            batch_size=500,
+        )
+
+    def remove(self, post_id):
+        SearchPosting.objects.filter(post_id=post_id).delete()
+
+    def clear(self):
+        SearchPosting.objects.all().delete()
+
+    def search(self, terms, offset, limit):
+        postings = SearchPosting.objects.filter(term__in=terms).order_by()
+        frequencies = dict(
+            postings.values_list("term").annotate(Count("pk"))
+        )
+        if len(frequencies) < len(terms):
+            return []
+        total = Post.objects.count()
+        idf = {
+            term: math.log(1 + total / frequency)
+            for term, frequency in frequencies.items()
+        }
+        score = Sum(F("weight") * Case(
+            *[When(term=term, then=Value(idf[term])) for term in terms],
+            output_field=FloatField(),
+        ))
+        rows = (
+            postings.values("post_id")
+            .annotate(matched=Count("term"), score=score)
+            .filter(matched=len(terms))
+            .order_by("-score", "-post_id")
+            .values_list("post_id", flat=True)
+        )
+        return list(rows[offset:offset + limit])
+
+
+BACKENDS = {"fts5": FTS5Backend(), "python": PythonBackend()}
+
+
+def documents(posts):
+    """Документы индекса ``(post_id, text, comments)`` для постов."""
+    posts = list(posts)
+    comments = {}
+    rows = (
+        Comment.objects.filter(post_id__in=[pk for pk, _ in posts])
+        .order_by("pk")
+        .values_list("post_id", "text")
+    )
+    for post_id, text in rows:
+        comments.setdefault(post_id, []).append(text)
+    return [
+        (pk, text, "\n".join(comments.get(pk, [])))
+        for pk, text in posts
+    ]
+
+
+def index_posts(posts):
+    """Обновляет индекс для пар ``(post_id, text)``."""
+    get_backend().update(documents(posts))
+
+
+def index_post(post_id):
+    index_posts(Post.objects.filter(pk=post_id).values_list("pk", "text"))
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+
+
+def add_comment(post_id, text):
+    """Дописывает новый комментарий к документу поста."""
+    get_backend().add_comment(post_id, tokenize(text))
+
+
+def remove_comment(post_id, text):
+    """Убирает из документа поста удалённый комментарий."""
+    get_backend().remove_comment(post_id, tokenize(text))
+
+
+def rebuild(batch_size=1000):
+    """Строит индекс заново; возвращает число проиндексированных постов."""
+    get_backend().clear()
+    total = 0
+    batch = []
+    posts = Post.objects.order_by("pk").values_list("pk", "text")
+    for row in posts.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            index_posts(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        index_posts(batch)
+        total += len(batch)
+    return total
+
+
+def search(query, offset=0, limit=None):
+    """Посты по запросу ``query`` в порядке убывания релевантности."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    limit = limit or settings.PAGE_SIZE
+    post_ids = get_backend().search(terms, offset, limit)
+    posts = Post.objects.for_feed().in_bulk(post_ids)
+    return [posts[pk] for pk in post_ids if pk in posts]
@@ -0,0 +1,318 @@
+"""Генерация синтетических данных для нагрузочного тестирования.
+
+Строки создаются через ``bulk_create`` пачками, без сигналов моделей,
+поэтому счётчики авторов, ленты подписок, поисковый индекс и варианты
+картинок строятся отдельными шагами в конце. Популярность авторов и
+постов распределена по закону Ципфа: у немногих авторов большая часть
+подписчиков.
+"""
+import io
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import caching, search, thumbnails, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .storage import post_images
+
+BATCH_SIZE = 1000
+WORDS = (
+    "утро", "вечер", "город", "река", "лес", "дорога", "дом", "кофе",
+    "книга", "поезд", "море", "снег", "дождь", "солнце", "друг", "работа",
+    "проект", "код", "музыка", "кино", "кошка", "собака", "сад", "осень",
+    "весна", "лето", "зима", "прогулка", "фото", "история", "новости",
+    "вопрос", "ответ", "идея", "план", "путешествие", "горы", "озеро",
+)
+
+
+def zipf_sampler(rng, population, exponent=1.0):
+    """Выборка из ``population`` с весом k-го элемента ``1 / k**exponent``."""
+    cum_weights = list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, len(population) + 1)
+    ))
+
+    def sample(count):
+        return rng.choices(population, cum_weights=cum_weights, k=count)
+
+    return sample
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert(model, objects, batch_size=BATCH_SIZE, ignore_conflicts=False):
+    """Вставляет объекты пачками, не держа в памяти больше одной пачки.
+
+    ``bulk_create`` сам превращает аргумент в список, поэтому генератор
+    на миллионы строк режется на пачки здесь.
+    """
+    for batch in batches(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+
+
+@contextmanager
+def explicit_dates(model, field_name):
+    """Позволяет записать свою дату в поле с ``auto_now_add``."""
+    field = model._meta.get_field(field_name)
+    auto_now_add = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = auto_now_add
+
+
+def last_pk(model):
+    return model.objects.order_by("-pk").values_list("pk", flat=True).first()
+
+
+def created_pks(model, previous_pk):
+    """Первичные ключи строк, вставленных после ``previous_pk``.
+
+    SQLite не возвращает ключи из ``bulk_create``, поэтому они читаются
+    из таблицы.
+    """
+    queryset = model.objects.order_by("pk").values_list("pk", flat=True)
+    if previous_pk is not None:
+        queryset = queryset.filter(pk__gt=previous_pk)
+    return list(queryset)
+
+
+def count_created(model, previous_pk):
+    queryset = model.objects.all()
+    if previous_pk is not None:
+        queryset = queryset.filter(pk__gt=previous_pk)
+    return queryset.count()
+
+
+def make_text(rng, min_words, max_words):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+
+def create_users(count, password=None, batch_size=BATCH_SIZE):
+    # Пароль хешируется один раз: хеш на каждого пользователя занял бы
+    # больше времени, чем вся остальная генерация.
+    password = make_password(password or None)
+    previous_pk = last_pk(User)
+    offset = (previous_pk or 0) + 1
+    insert(
+        User,
+        (User(username=f"user{offset + i}", password=password)
+         for i in range(count)),
+        batch_size,
+        ignore_conflicts=True,
+    )
+    return created_pks(User, previous_pk)
+
+
+def create_groups(count, batch_size=BATCH_SIZE):
+    previous_pk = last_pk(Group)
+    offset = (previous_pk or 0) + 1
+    insert(
+        Group,
+        (Group(title=f"Группа {offset + i}", slug=f"group-{offset + i}",
+               description=f"Описание группы {offset + i}")
+         for i in range(count)),
+        batch_size,
+        ignore_conflicts=True,
+    )
+    return created_pks(Group, previous_pk)
+
+
+def create_images(rng, count):
+    """Сохраняет ``count`` разных картинок и возвращает их имена.
+
+    Хранилище адресует файлы по содержимому, поэтому посты делят
+    небольшой набор файлов, как при повторных загрузках одного фото.
+    """
+    names = []
+    for _ in range(count):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+        names.append(post_images.save("posts/seed.jpg",
+                                      ContentFile(buffer.getvalue())))
+    return names
+
+
+def random_dates(rng, count, days):
+    """Даты за последние ``days`` дней по возрастанию."""
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+    return sorted(
+        now - timedelta(seconds=rng.uniform(0, span)) for _ in range(count)
+    )
+
+
+def create_posts(rng, count, user_ids, group_ids, image_share=0.0,
+                 image_count=10, days=365, batch_size=BATCH_SIZE):
+    """Создаёт посты в порядке публикации; возвращает пары (pk, дата)."""
+    authors = zipf_sampler(rng, user_ids)(count)
+    groups = list(group_ids) + [None]
+    images = create_images(rng, image_count) if image_share else []
+    dates = random_dates(rng, count, days)
+    previous_pk = last_pk(Post)
+    posts = (
+        Post(
+            author_id=author_id,
+            group_id=rng.choice(groups),
+            text=make_text(rng, 5, 60),
+            pub_date=pub_date,
+            image=(rng.choice(images)
+                   if images and rng.random() < image_share else ""),
+        )
+        for author_id, pub_date in zip(authors, dates)
+    )
+    with explicit_dates(Post, "pub_date"):
+        insert(Post, posts, batch_size)
+    return list(zip(created_pks(Post, previous_pk), dates))
+
+
+def create_comments(rng, count, posts, user_ids, batch_size=BATCH_SIZE):
+    """Комментарии к постам; самые обсуждаемые — самые свежие."""
+    now = timezone.now()
+    targets = zipf_sampler(rng, posts[::-1], exponent=0.8)(count)
+    comments = (
+        Comment(
+            post_id=post_id,
+            author_id=rng.choice(user_ids),
+            text=make_text(rng, 2, 20),
+            created=pub_date + (now - pub_date) * rng.random(),
+        )
+        for post_id, pub_date in targets
+    )
+    with explicit_dates(Comment, "created"):
+        insert(Comment, comments, batch_size)
+
+
+def create_follows(rng, count, user_ids, batch_size=BATCH_SIZE):
+    """Подписки с числом подписчиков по закону Ципфа.
+
+    Повторные пары и подписки на себя отбрасываются, поэтому подписок
+    может получиться немного меньше ``count``.
+    """
+    authors = zipf_sampler(rng, user_ids)(count)
+    follows = (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in zip(
+            (rng.choice(user_ids) for _ in range(count)), authors
+        )
+        if user_id != author_id
+    )
+    insert(Follow, follows, batch_size, ignore_conflicts=True)
+
+
+def rebuild_stats(user_ids, batch_size=BATCH_SIZE):
+    for batch in batches(user_ids, batch_size):
+        AuthorStats.objects.rebuild(batch)
+
+
+def fill_timelines():
+    """Раскладывает последние посты авторов по лентам подписчиков.
+
+    Делает то же, что ``timeline.backfill`` для каждой подписки, но
+    одним ``INSERT ... SELECT`` на автора: через ORM пришлось бы создать
+    по объекту на каждую из миллионов записей.
+    """
+    author_ids = AuthorStats.objects.filter(
+        followers_count__gt=0,
+        followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list("user_id", flat=True)
+    total = 0
+    for author_id in author_ids.iterator():
+        with transaction.atomic():
+            total += timeline.fill_author(author_id)
+    return total
+
+
+def index_posts(post_ids, batch_size=BATCH_SIZE):
+    for batch in batches(post_ids, batch_size):
+        search.index_posts(
+            Post.objects.filter(pk__in=batch).values_list("pk", "text")
+        )
+
+
+def touched_authors(previous_post, previous_follow):
+    """Авторы, у которых после ``previous_*`` появились посты или
+    подписки; остальные профили не менялись."""
+    authors = set(
+        Post.objects.filter(pk__gt=previous_post or 0)
+        .values_list("author_id", flat=True).distinct()
+    )
+    for pair in Follow.objects.filter(
+        pk__gt=previous_follow or 0
+    ).values_list("user_id", "author_id"):
+        authors.update(pair)
+    return authors
+
+
+def bump_versions(author_ids, group_ids):
+    """Сбрасывает страницы, на которые попали вставленные строки.
+
+    Весь кэш не очищается: он может быть общим с другими сайтами и
+    процессами. Версии страниц новых постов менять не нужно: их ключи
+    ещё не выдавались, и в кэше для них ничего нет.
+    """
+    caching.bump_version(caching.INDEX)
+    for group_id in group_ids:
+        caching.bump_version(caching.GROUP, group_id)
+    for author_id in author_ids:
+        caching.bump_version(caching.AUTHOR, author_id)
+
+
+def seed(users, groups, posts, comments, follows, image_share=0.0,
+         days=365, password=None, seed=None, index=True,
+         batch_size=BATCH_SIZE, log=None):
+    """Создаёт набор данных; ``log(step, count)`` сообщает о каждом шаге.
+
+    Возвращает ключи созданных пользователей.
+    """
+    log = log or (lambda step, count: None)
+    rng = random.Random(seed)
+    user_ids = create_users(users, password, batch_size)
+    log("users", len(user_ids))
+    group_ids = create_groups(groups, batch_size)
+    log("groups", len(group_ids))
+    authors = user_ids or list(User.objects.values_list("pk", flat=True))
+    if not authors:
+        return user_ids
+    previous_post = last_pk(Post)
+    created_posts = create_posts(rng, posts, authors, group_ids,
+                                 image_share=image_share, days=days,
+                                 batch_size=batch_size)
+    log("posts", len(created_posts))
+    if created_posts:
+        previous_comment = last_pk(Comment)
+        create_comments(rng, comments, created_posts, authors, batch_size)
+        log("comments", count_created(Comment, previous_comment))
+    previous_follow = last_pk(Follow)
+    create_follows(rng, follows, authors, batch_size)
+    log("follows", len(created_pks(Follow, previous_follow)))
+    rebuild_stats(authors, batch_size)
+    log("stats", len(authors))
+    log("timelines", fill_timelines())
+    if index:
+        index_posts((pk for pk, _ in created_posts), batch_size)
+        log("search", len(created_posts))
+    if image_share:
+        log("thumbnails", thumbnails.build_missing())
+    # Сигналы не срабатывали, поэтому версии страниц не менялись.
+    bump_versions(touched_authors(previous_post, previous_follow),
+                  group_ids)
+    return user_ids
@@ -0,0 +1,213 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import jobs
+from . import caching, media, search, thumbnails, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    caching.bump_post_scopes(instance.pk, instance.author_id,
+                             instance.group_id)
+    previous_group_id = getattr(instance, "_previous_group_id", None)
+    if previous_group_id not in (None, instance.group_id):
+        caching.bump_version(caching.GROUP, previous_group_id)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    caching.bump_version(caching.POST, instance.post_id)
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    caching.bump_version(caching.AUTHOR, instance.author_id)
+    caching.bump_version(caching.AUTHOR, instance.user_id)
+
+
+# Поля, которые выводятся на страницах постов, а не только на
+# собственной странице группы или профиле пользователя.
+GROUP_DISPLAY_FIELDS = ("title", "slug")
+USER_DISPLAY_FIELDS = ("username", "first_name", "last_name")
+
+
+def remember_display_fields(instance, fields, update_fields):
+    instance._previous_display = None
+    if instance.pk is None or (
+        update_fields is not None and not set(fields) & set(update_fields)
+    ):
+        return
+    instance._previous_display = (
+        type(instance)._default_manager.filter(pk=instance.pk)
+        .values_list(*fields).first()
+    )
+
+
+def display_changed(instance, fields):
+    previous = getattr(instance, "_previous_display", None)
+    return previous is not None and previous != tuple(
+        getattr(instance, field) for field in fields
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_display(sender, instance, update_fields, **kwargs):
+    remember_display_fields(instance, GROUP_DISPLAY_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_page(sender, instance, **kwargs):
+    caching.bump_version(caching.GROUP, instance.pk)
+    if display_changed(instance, GROUP_DISPLAY_FIELDS):
+        # Название и ссылка на группу есть в карточке каждого её поста.
+        caching.bump_posts_scopes(instance.posts.values_list(
+            "pk", "author_id", "group_id"
+        ).iterator())
+
+
+@receiver(pre_save, sender=User)
+def remember_user_display(sender, instance, update_fields, **kwargs):
+    # Вход сохраняет только last_login; лишний запрос ему не нужен.
+    remember_display_fields(instance, USER_DISPLAY_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_author_page(sender, instance, created, **kwargs):
+    # Первичный ключ удалённого пользователя может достаться новому;
+    # новая версия не даст ему увидеть чужие фрагменты.
+    if created:
+        caching.bump_version(caching.AUTHOR, instance.pk)
+    elif display_changed(instance, USER_DISPLAY_FIELDS):
+        # Имя автора выводится в карточках его постов и в комментариях.
+        caching.bump_version(caching.AUTHOR, instance.pk)
+        caching.bump_posts_scopes(
+            Post.objects.filter(
+                Q(author=instance) | Q(comments__author=instance)
+            ).distinct().values_list("pk", "author_id", "group_id")
+            .iterator()
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.increment(instance.author_id, "posts_count")
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, **kwargs):
+    if created:
+        jobs.enqueue(timeline.fan_out_post, instance.pk, instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    AuthorStats.objects.decrement(instance.author_id, "posts_count")
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.increment(instance.author_id, "comments_count")
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    AuthorStats.objects.decrement(instance.author_id, "comments_count")
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.increment(instance.author_id, "followers_count")
+        AuthorStats.objects.increment(instance.user_id, "following_count")
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    AuthorStats.objects.decrement(instance.author_id, "followers_count")
+    AuthorStats.objects.decrement(instance.user_id, "following_count")
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def refill_former_pulled_author(sender, instance, **kwargs):
+    # Пока у автора было больше TIMELINE_FANOUT_LIMIT подписчиков, его
+    # посты не попадали в ленты; теперь их нужно разложить, иначе они
+    # пропадут из лент. Счётчик уже уменьшен в count_deleted_follow.
+    if timeline.left_pulled(instance.author_id):
+        jobs.enqueue(timeline.fill_author, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    previous = None
+    if instance.pk is not None:
+        previous = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list("image", "group_id")
+            .first()
+        )
+    instance._previous_image, instance._previous_group_id = (
+        previous or ("", None)
+    )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_image", "")
+    if previous and previous != instance.image.name:
+        transaction.on_commit(partial(media.release, previous))
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, **kwargs):
+    # Картинку меняют не только формы сайта, но и админка и скрипты.
+    previous = getattr(instance, "_previous_image", "")
+    if (instance.image.name or "") != previous:
+        thumbnails.schedule(instance)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        transaction.on_commit(partial(media.release, instance.image.name))
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    search.index_posts([(instance.pk, instance.text)])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        search.add_comment(instance.post_id, instance.text)
+    else:
+        # Прежний текст неизвестен; правка комментария — редкость.
+        search.index_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search.remove_comment(instance.post_id, instance.text)
@@ -0,0 +1,167 @@
+"""Карта сайта для поисковых роботов.
+
+Файлы пишет команда ``build_sitemaps`` в ``SITEMAP_ROOT``: по
+``SHARD_SIZE`` адресов в файле ``sitemap-<раздел>-<номер>.xml`` и
+индекс ``sitemap.xml`` со ссылками на них. Строки читаются из базы
+через ``iterator`` и сразу пишутся в файл, поэтому память не зависит
+от числа постов. Отдаются файлы как статика с ``SITEMAP_URL``.
+"""
+import os
+from datetime import timezone
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Max
+from django.urls import reverse
+
+from .models import Group, Post, User
+
+SHARD_SIZE = 50000
+CHUNK_SIZE = 2000
+INDEX_NAME = "sitemap.xml"
+XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def post_entries(chunk_size=CHUNK_SIZE):
+    # reverse() на каждый из миллионов постов заметно дороже подстановки
+    # номера в готовый шаблон адреса.
+    url = reverse("posts:post_detail", kwargs={"post_id": 0})
+    prefix, suffix = url.rsplit("0", 1)
+    posts = Post.objects.order_by("pk").values_list("pk", "pub_date")
+    for pk, pub_date in posts.iterator(chunk_size=chunk_size):
+        yield f"{prefix}{pk}{suffix}", pub_date
+
+
+def group_entries(chunk_size=CHUNK_SIZE):
+    groups = (
+        Group.objects.order_by("pk")
+        .annotate(lastmod=Max("posts__pub_date"))
+        .values_list("slug", "lastmod")
+    )
+    for slug, lastmod in groups.iterator(chunk_size=chunk_size):
+        yield reverse("posts:group_list", kwargs={"slug": slug}), lastmod
+
+
+def profile_entries(chunk_size=CHUNK_SIZE):
+    # В карту попадают только авторы: пустые профили роботам не нужны.
+    authors = (
+        User.objects.order_by("pk")
+        .annotate(lastmod=Max("posts__pub_date"))
+        .filter(lastmod__isnull=False)
+        .values_list("username", "lastmod")
+    )
+    for username, lastmod in authors.iterator(chunk_size=chunk_size):
+        yield (reverse("posts:profile", kwargs={"username": username}),
+               lastmod)
+
+
+SECTIONS = {
+    "posts": post_entries,
+    "groups": group_entries,
+    "profiles": profile_entries,
+}
+
+
+def w3c_date(value):
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+class ShardWriter:
+    """Пишет адреса раздела в файлы по ``shard_size`` штук.
+
+    Каждый файл сначала пишется во временный и переименовывается
+    целиком, чтобы робот не получил недописанную карту.
+    """
+
+    def __init__(self, root, section, base_url, shard_size):
+        self.root = root
+        self.section = section
+        self.base_url = base_url.rstrip("/")
+        self.shard_size = shard_size
+        self.shards = []
+        self._file = None
+        self._name = None
+        self._path = None
+        self._count = 0
+        self._lastmod = None
+
+    def add(self, path, lastmod):
+        if self._file is None or self._count == self.shard_size:
+            self._close()
+            self._open()
+        lines = [f"<url><loc>{escape(self.base_url + path)}</loc>"]
+        if lastmod is not None:
+            lines.append(f"<lastmod>{w3c_date(lastmod)}</lastmod>")
+            if self._lastmod is None or lastmod > self._lastmod:
+                self._lastmod = lastmod
+        lines.append("</url>\n")
+        self._file.write("".join(lines))
+        self._count += 1
+
+    def finish(self):
+        self._close()
+        return self.shards
+
+    def _open(self):
+        name = f"sitemap-{self.section}-{len(self.shards) + 1}.xml"
+        self._name = name
+        self._path = os.path.join(self.root, name)
+        self._file = open(self._path + ".tmp", "w", encoding="utf-8")
+        self._file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<urlset xmlns="{XMLNS}">\n'
+        )
+        self._count = 0
+        self._lastmod = None
+
+    def _close(self):
+        if self._file is None:
+            return
+        self._file.write("</urlset>\n")
+        self._file.close()
+        os.replace(self._path + ".tmp", self._path)
+        self.shards.append((self._name, self._count, self._lastmod))
+        self._file = None
+
+
+def write_index(root, base_url, shards):
+    path = os.path.join(root, INDEX_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as index:
+        index.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    f'<sitemapindex xmlns="{XMLNS}">\n')
+        for name, _, lastmod in shards:
+            index.write(
+                f"<sitemap><loc>{escape(base_url + name)}</loc>"
+                + (f"<lastmod>{w3c_date(lastmod)}</lastmod>"
+                   if lastmod is not None else "")
+                + "</sitemap>\n"
+            )
+        index.write("</sitemapindex>\n")
+    os.replace(path + ".tmp", path)
+
+
+def remove_stale(root, shards):
+    """Удаляет файлы разделов, которых нет в новой карте."""
+    current = {name for name, _, _ in shards}
+    for name in os.listdir(root):
+        if (name.startswith("sitemap-") and name.endswith(".xml")
+                and name not in current):
+            os.remove(os.path.join(root, name))
+
+
+def build(root=None, site_url=None, shard_size=SHARD_SIZE,
+          chunk_size=CHUNK_SIZE):
+    """Строит карту сайта; возвращает ``(имя, адресов, lastmod)`` файлов."""
+    root = root or settings.SITEMAP_ROOT
+    site_url = (site_url or settings.SITE_URL).rstrip("/")
+    os.makedirs(root, exist_ok=True)
+    shards = []
+    for section, entries in SECTIONS.items():
+        writer = ShardWriter(root, section, site_url, shard_size)
+        for path, lastmod in entries(chunk_size):
+            writer.add(path, lastmod)
+        shards.extend(writer.finish())
+    # Индекс ссылается на файлы по их публичному адресу.
+    write_index(root, site_url + settings.SITEMAP_URL, shards)
+    remove_stale(root, shards)
+    return shards
@@ -0,0 +1,59 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Имя файла строится из SHA-256 его содержимого, поэтому одинаковые
+картинки (репосты, повторная отправка того же файла при редактировании)
+хранятся на диске один раз и делят один набор миниатюр. На файл может
+ссылаться несколько постов; удаляет его только ``release``, когда
+ссылок не осталось.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файл под именем ``<каталог>/<ab>/<sha256><расширение>``.
+
+    Если файл с таким содержимым уже есть, повторно он не пишется.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, hexdigest[:2], hexdigest + ext)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Обновляем время изменения, чтобы сборщик мусора не удалил
+            # файл, на который вот-вот сошлётся новый пост.
+            os.utime(self.path(name))
+            return name
+        stored = self._save(name, content)
+        if stored != name:
+            # Тот же файл параллельно записал другой запрос.
+            self.delete(stored)
+        return name
+
+    def is_recent(self, name):
+        """Файл изменялся в течение ``POST_IMAGE_GC_GRACE_PERIOD``."""
+        age = timezone.now() - self.get_modified_time(name)
+        return age.total_seconds() < settings.POST_IMAGE_GC_GRACE_PERIOD
+
+
+post_images = ContentAddressedStorage()
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin"
+        )
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def create_post(self, index):
+        author = User.objects.create_user(username=f"author{index}")
+        Post.objects.create(author=author, text="Тестовый текст",
+                            group=self.group)
+
+    def count_changelist_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse("admin:posts_post_changelist")
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        self.create_post(0)
+        one_row = self.count_changelist_queries()
+        for i in range(1, 5):
+            self.create_post(i)
+        self.assertEqual(self.count_changelist_queries(), one_row)
@@ -0,0 +1,130 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    posts_count = 13
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f"Тестовый текст {i}",
+                 group=cls.group)
+            for i in range(cls.posts_count)
+        )
+        cls.post = Post.objects.create(author=cls.reader, text="Свой пост")
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text="Комментарий")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_posts_page_with_cursor(self):
+        response = self.client.get(reverse("posts:api_posts"))
+        data = response.json()
+        self.assertEqual(len(data["results"]), 10)
+        self.assertIsNone(data["previous"])
+        self.assertEqual(data["results"][0], {
+            "id": self.post.pk,
+            "text": "Свой пост",
+            "pub_date": self.post.pub_date.isoformat(),
+            "author": "reader",
+            "group": None,
+            "image": None,
+            "thumbnails": [],
+        })
+        data = self.client.get(data["next"]).json()
+        self.assertEqual(len(data["results"]), self.posts_count + 1 - 10)
+        self.assertIsNone(data["next"])
+        self.assertIsNotNone(data["previous"])
+
+    def test_fields_and_limit(self):
+        url = reverse("posts:api_posts")
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, {"fields": "id,author", "limit": 3}
+            )
+        data = response.json()
+        self.assertEqual(len(data["results"]), 3)
+        self.assertEqual(set(data["results"][0]), {"id", "author"})
+        self.assertIn("fields=id%2Cauthor", data["next"])
+        self.assertIn("limit=3", data["next"])
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse("posts:api_posts"),
+                                   {"fields": "id,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["error"])
+
+    def test_post_detail(self):
+        url = reverse("posts:api_post", kwargs={"post_id": self.post.pk})
+        self.assertEqual(self.client.get(url, {"fields": "text"}).json(),
+                         {"text": "Свой пост"})
+        url = reverse("posts:api_post", kwargs={"post_id": 0})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("error", response.json())
+
+    def test_comments(self):
+        url = reverse("posts:api_comments",
+                      kwargs={"post_id": self.post.pk})
+        results = self.client.get(url).json()["results"]
+        self.assertEqual([comment["text"] for comment in results],
+                         ["Комментарий"])
+        self.assertEqual(results[0]["author"], "author")
+
+    def test_groups_and_group_posts(self):
+        groups = self.client.get(reverse("posts:api_groups")).json()
+        self.assertEqual(groups["results"][0]["slug"], "test-slug")
+        url = reverse("posts:api_group_posts", kwargs={"slug": "test-slug"})
+        results = self.client.get(url, {"limit": 100}).json()["results"]
+        self.assertEqual(len(results), self.posts_count)
+
+    def test_profile_posts(self):
+        url = reverse("posts:api_profile_posts",
+                      kwargs={"username": "reader"})
+        results = self.client.get(url).json()["results"]
+        self.assertEqual([post["id"] for post in results], [self.post.pk])
+
+    def test_follow_feed(self):
+        url = reverse("posts:api_follow")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        results = self.authorized_client.get(
+            url, {"limit": 100}
+        ).json()["results"]
+        self.assertEqual(len(results), self.posts_count)
+        self.assertEqual({post["author"] for post in results}, {"author"})
+
+    def test_export_streams_json_lines(self):
+        url = reverse("posts:api_export")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.authorized_client.get(
+            url, {"author": "author", "fields": "id,text"}
+        )
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), self.posts_count)
+        self.assertEqual(set(rows[0]), {"id", "text"})
+
+    def test_read_only(self):
+        response = self.authorized_client.post(reverse("posts:api_posts"))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PAGE_SIZE=5)
+class CommentPaginationTests(TestCase):
+    comments_count = 7
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.post = Post.objects.create(author=cls.user, text="Текст")
+        for i in range(cls.comments_count):
+            commenter = User.objects.create_user(username=f"reader{i}")
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f"Комментарий {i}"
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.detail_url = reverse(
+            "posts:post_detail", kwargs={"post_id": self.post.pk}
+        )
+        self.fragment_url = reverse(
+            "posts:comment_list", kwargs={"post_id": self.post.pk}
+        )
+
+    def test_initial_render_is_capped(self):
+        response = self.client.get(self.detail_url)
+        comments = response.context["comments"]
+        self.assertEqual(len(comments), 5)
+        self.assertEqual(comments[0].text, "Комментарий 6")
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, "Показать ещё комментарии")
+
+    def test_fragment_returns_next_page(self):
+        response = self.client.get(self.detail_url)
+        cursor = response.context["comments"].paginator.next_cursor
+        response = self.client.get(self.fragment_url, {"after": cursor})
+        comments = response.context["comments"]
+        self.assertEqual([comment.text for comment in comments],
+                         ["Комментарий 1", "Комментарий 0"])
+        self.assertNotContains(response, "Показать ещё комментарии")
+        self.assertNotContains(response, "<html")
+
+    def test_comment_authors_are_joined(self):
+        # Пост и страница комментариев вместе с авторами.
+        with self.assertNumQueries(2):
+            self.client.get(self.fragment_url)
+
+    def test_fragment_for_missing_post(self):
+        response = self.client.get(
+            reverse("posts:comment_list", kwargs={"post_id": 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,162 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import execute_on_commit
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_SHARED=True)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.other_group = Group.objects.create(
+            title="Другая группа",
+            slug="other-slug",
+            description="Тестовое описание",
+        )
+
+    def setUp(self):
+        caches["index_page"].clear()
+        self.post = Post.objects.create(
+            author=self.author, text="Тестовый текст", group=self.group
+        )
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = {
+            "index": reverse("posts:index"),
+            "group": reverse("posts:group_list", kwargs={"slug": "test-slug"}),
+            "profile": reverse("posts:profile",
+                               kwargs={"username": "author"}),
+            "post": reverse("posts:post_detail",
+                            kwargs={"post_id": self.post.pk}),
+            "follow": reverse("posts:follow_index"),
+        }
+
+    def etag(self, name):
+        return self.reader_client.get(self.urls[name])["ETag"]
+
+    def test_unchanged_page_is_not_rendered(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.etag(name)
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_editing_post_changes_its_pages(self):
+        names = ("index", "group", "profile", "post")
+        before = {name: self.etag(name) for name in names}
+        with execute_on_commit():
+            self.post.text = "Новый текст"
+            self.post.save()
+        for name in names:
+            with self.subTest(page=name):
+                self.assertNotEqual(self.etag(name), before[name])
+
+    def test_etag_changes_only_after_commit(self):
+        names = ("index", "group", "profile", "post")
+        before = {name: self.etag(name) for name in names}
+        with execute_on_commit():
+            self.post.text = "Новый текст"
+            self.post.save()
+            # Читатель в окне записи закеширует старую страницу под
+            # старым ETag, поэтому версия не должна смениться раньше
+            # фиксации: иначе старая страница получит новый ETag.
+            for name in names:
+                with self.subTest(page=name, committed=False):
+                    self.assertEqual(self.etag(name), before[name])
+        for name in names:
+            with self.subTest(page=name, committed=True):
+                self.assertNotEqual(self.etag(name), before[name])
+
+    def test_moving_post_changes_old_group(self):
+        before = self.etag("group")
+        with execute_on_commit():
+            self.post.group = self.other_group
+            self.post.save()
+        self.assertNotEqual(self.etag("group"), before)
+
+    def test_comment_changes_only_post_page(self):
+        group_etag = self.etag("group")
+        post_etag = self.etag("post")
+        with execute_on_commit():
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text="Комментарий")
+        self.assertNotEqual(self.etag("post"), post_etag)
+        self.assertEqual(self.etag("group"), group_etag)
+
+    def test_follow_changes_profile_and_feed(self):
+        profile_etag = self.etag("profile")
+        follow_etag = self.etag("follow")
+        with execute_on_commit():
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertNotEqual(self.etag("profile"), profile_etag)
+        self.assertNotEqual(self.etag("follow"), follow_etag)
+
+    def test_renaming_group_changes_pages_of_its_posts(self):
+        names = ("index", "group", "profile", "post")
+        before = {name: self.etag(name) for name in names}
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = "Новое название"
+        with execute_on_commit():
+            group.save()
+        for name in names:
+            with self.subTest(page=name):
+                self.assertNotEqual(self.etag(name), before[name])
+
+    def test_renaming_user_changes_pages_of_posts_and_comments(self):
+        commented = Post.objects.create(author=self.reader, text="Чужой")
+        Comment.objects.create(post=commented, author=self.author,
+                               text="Комментарий")
+        self.urls["commented"] = reverse(
+            "posts:post_detail", kwargs={"post_id": commented.pk}
+        )
+        names = ("index", "group", "profile", "post", "commented")
+        before = {name: self.etag(name) for name in names}
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = "Лев"
+        with execute_on_commit():
+            author.save()
+        for name in names:
+            with self.subTest(page=name):
+                self.assertNotEqual(self.etag(name), before[name])
+
+    def test_login_does_not_look_for_renames(self):
+        with self.assertNumQueries(1):
+            self.reader.save(update_fields=["last_login"])
+
+    @override_settings(PAGE_CACHE_SHARED=False)
+    def test_no_etag_without_shared_cache(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.reader_client.get(url)
+                self.assertFalse(response.has_header("ETag"))
+        feed = self.reader_client.get(reverse("posts:feed"))
+        self.assertFalse(feed.has_header("ETag"))
+
+    def test_etag_depends_on_user_and_page(self):
+        etag = self.etag("index")
+        self.assertNotEqual(self.client.get(self.urls["index"])["ETag"], etag)
+        response = self.reader_client.get(self.urls["index"], {"page": 2})
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_missing_objects_return_404(self):
+        response = self.reader_client.get(
+            reverse("posts:post_detail", kwargs={"post_id": 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import execute_on_commit
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_SHARED=True)
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="auth")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text="Пост в группе")
+        Post.objects.create(author=cls.author, text="Пост без группы")
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.client = Client()
+
+    def test_feeds_list_posts(self):
+        cases = (
+            ("posts:feed", {}, ["Пост в группе", "Пост без группы"]),
+            ("posts:group_feed", {"slug": "test-slug"}, ["Пост в группе"]),
+            ("posts:profile_feed", {"username": "auth"},
+             ["Пост в группе", "Пост без группы"]),
+        )
+        for name, kwargs, texts in cases:
+            for suffix, content_type in (("", "application/rss+xml"),
+                                         ("_atom", "application/atom+xml")):
+                with self.subTest(feed=name + suffix):
+                    response = self.client.get(reverse(name + suffix,
+                                                       kwargs=kwargs))
+                    self.assertTrue(
+                        response["Content-Type"].startswith(content_type)
+                    )
+                    for text in texts:
+                        self.assertContains(response, text)
+                    self.assertTrue(response.has_header("ETag"))
+                    self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_unknown_group(self):
+        url = reverse("posts:group_feed", kwargs={"slug": "missing"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_repeated_poll_is_not_modified(self):
+        url = reverse("posts:feed")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_edited_post_is_not_hidden_by_date(self):
+        url = reverse("posts:feed")
+        self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = "Исправленный пост"
+        with execute_on_commit():
+            post.save()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Исправленный пост")
+
+    def test_links_follow_request_host(self):
+        url = reverse("posts:feed")
+        self.client.get(url, HTTP_HOST="localhost")
+        response = self.client.get(url)
+        self.assertContains(response, "http://testserver/")
+        self.assertNotContains(response, "http://localhost/")
+
+    def test_new_post_changes_feed(self):
+        url = reverse("posts:group_feed", kwargs={"slug": "test-slug"})
+        etag = self.client.get(url)["ETag"]
+        with execute_on_commit():
+            Post.objects.create(author=self.author, group=self.group,
+                                text="Свежий пост")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Свежий пост")
+
+    def test_pages_link_to_feeds(self):
+        response = self.client.get(reverse("posts:group_list",
+                                           kwargs={"slug": "test-slug"}))
+        self.assertContains(
+            response, reverse("posts:group_feed_atom",
+                              kwargs={"slug": "test-slug"})
+        )
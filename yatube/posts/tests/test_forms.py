@@ -18,7 +18,6 @@ class PostCreateFormTests(TestCase):
     post_text_new = "Текст для теста test_new_post_created_in_database"
     post_text_edited = "Отредактированный текст"
     post_author = "auth"
-    image = "posts/small.gif"
     comment_text = "Текст комментария"
 
     @classmethod
@@ -70,8 +69,9 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.author.username, self.post_author)
         self.assertEqual(post.group, None)
         self.assertTrue(
-            Post.objects.filter(text=self.post_text_new, image=self.image)
-                .exists()
+            Post.objects.filter(text=self.post_text_new,
+                                image__startswith="posts/",
+                                image__endswith=".gif").exists()
         )
 
     def test_new_post_not_created_in_database(self):
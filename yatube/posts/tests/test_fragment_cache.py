@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import execute_on_commit
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PageFragmentCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+
+    def setUp(self):
+        caches["index_page"].clear()
+        self.client = Client()
+        self.post = Post.objects.create(
+            author=self.author, text="Тестовый текст", group=self.group
+        )
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.author, text="Комментарий"
+        )
+        self.urls = (
+            reverse("posts:group_list", kwargs={"slug": "test-slug"}),
+            reverse("posts:profile", kwargs={"username": "author"}),
+        )
+        self.post_url = reverse(
+            "posts:post_detail", kwargs={"post_id": self.post.pk}
+        )
+
+    def test_feed_fragments_are_cached(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                # update() не отправляет сигналов: фрагмент из кэша.
+                Post.objects.filter(pk=self.post.pk).update(text="Скрыто")
+                self.assertContains(self.client.get(url), "Тестовый текст")
+                Post.objects.filter(pk=self.post.pk).update(
+                    text="Тестовый текст"
+                )
+
+    def test_cached_fragment_skips_post_query(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                with self.assertNumQueries(2):
+                    self.client.get(url)
+                with self.assertNumQueries(1):
+                    self.client.get(url)
+
+    def test_comments_fragment_is_cached(self):
+        self.client.get(self.post_url)
+        Comment.objects.filter(pk=self.comment.pk).update(text="Скрыто")
+        self.assertContains(self.client.get(self.post_url), "Комментарий")
+
+    def test_signals_change_fragment_versions(self):
+        for url in (*self.urls, self.post_url):
+            self.client.get(url)
+        with execute_on_commit():
+            self.post.text = "Новый текст"
+            self.post.save()
+            Comment.objects.create(post=self.post, author=self.author,
+                                   text="Новый комментарий")
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), "Новый текст")
+        self.assertContains(self.client.get(self.post_url),
+                            "Новый комментарий")
@@ -0,0 +1,104 @@
+import posixpath
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import media, thumbnails
+from ..models import Post
+from ..storage import post_images
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_WORKERS=0,
+                   POST_IMAGE_GC_GRACE_PERIOD=0)
+class ContentAddressedMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name="small.gif", content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user,
+            text="Тестовый текст",
+            image=SimpleUploadedFile(name, content, "image/gif"),
+        )
+
+    def test_identical_images_are_stored_once(self):
+        first = self.create_post("first.gif")
+        second = self.create_post("second.gif")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            first.image.name,
+            post_images.content_name("posts/x.gif", ContentFile(SMALL_GIF)),
+        )
+        directory = posixpath.dirname(first.image.name)
+        self.assertEqual(len(post_images.listdir(directory)[1]), 1)
+
+    def test_variants_are_shared(self):
+        first = self.create_post()
+        thumbnails.submit(first.pk, first.image.name)
+        second = self.create_post()
+        thumbnails.submit(second.pk, second.image.name)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image_variants, second.image_variants)
+        self.assertTrue(default_storage.exists(first.thumbnail["name"]))
+
+    def test_release_keeps_referenced_image(self):
+        first = self.create_post()
+        self.create_post()
+        first.delete()
+        self.assertFalse(media.release(first.image.name))
+        self.assertTrue(post_images.exists(first.image.name))
+
+    def test_release_deletes_last_reference(self):
+        post = self.create_post()
+        thumbnails.submit(post.pk, post.image.name)
+        variant = Post.objects.get(pk=post.pk).thumbnail["name"]
+        post.delete()
+        self.assertTrue(media.release(post.image.name))
+        self.assertFalse(post_images.exists(post.image.name))
+        self.assertFalse(default_storage.exists(variant))
+
+    @override_settings(POST_IMAGE_GC_GRACE_PERIOD=3600)
+    def test_release_keeps_recent_files(self):
+        post = self.create_post()
+        post.delete()
+        self.assertFalse(media.release(post.image.name))
+        self.assertTrue(post_images.exists(post.image.name))
+
+    def test_collect_media_command(self):
+        kept = self.create_post()
+        orphan = post_images.save("posts/orphan.gif",
+                                  ContentFile(SMALL_GIF + b"\0"))
+        stale = default_storage.save("cache/posts/1/960x339.jpg",
+                                     ContentFile(b"jpeg"))
+        call_command("collect_media", stdout=StringIO())
+        self.assertTrue(post_images.exists(kept.image.name))
+        self.assertFalse(post_images.exists(orphan))
+        self.assertFalse(default_storage.exists(stale))
+        self.assertFalse(default_storage.exists("cache/posts/1"))
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..paginator import CursorPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    posts_count = 13
+    page_size = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f"Тестовый текст {i}", group=cls.group)
+            for i in range(cls.posts_count)
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_paginator(self):
+        return CursorPaginator(Post.objects.all(), self.page_size)
+
+    def test_first_page(self):
+        paginator = self.get_paginator()
+        page = paginator.get_page()
+        self.assertEqual(len(page), self.page_size)
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+        self.assertIsNotNone(paginator.next_cursor)
+
+    def test_after_cursor_returns_rest(self):
+        first = self.get_paginator()
+        first_page = first.get_page()
+        second = self.get_paginator()
+        second_page = second.get_page(after=first.next_cursor)
+        self.assertEqual(len(second_page),
+                         self.posts_count - self.page_size)
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(second_page.has_next())
+        ids = {post.pk for post in first_page}
+        ids.update(post.pk for post in second_page)
+        self.assertEqual(len(ids), self.posts_count)
+
+    def test_before_cursor_returns_previous_page(self):
+        first = self.get_paginator()
+        first_page = first.get_page()
+        second = self.get_paginator()
+        second.get_page(after=first.next_cursor)
+        back = self.get_paginator()
+        back_page = back.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+        self.assertTrue(back_page.has_next())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page = self.get_paginator().get_page(after="не-курсор")
+        self.assertEqual(list(page), list(self.get_paginator().get_page()))
+
+    def test_cursor_pages_do_not_count(self):
+        paginator = self.get_paginator()
+        paginator.get_page()
+        with self.assertNumQueries(1):
+            self.get_paginator().get_page(after=paginator.next_cursor)
+
+    def test_feed_views_follow_cursor(self):
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": "test-slug"}),
+            reverse("posts:profile", kwargs={"username": "auth"}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                cursor = response.context["page_obj"].paginator.next_cursor
+                response = self.authorized_client.get(
+                    url, {"after": cursor}
+                )
+                self.assertEqual(len(response.context["page_obj"]),
+                                 self.posts_count - self.page_size)
@@ -0,0 +1,153 @@
+"""Бюджеты числа запросов и времени отклика для всех адресов сайта.
+
+Набор данных по умолчанию небольшой, и проверяется только число
+запросов: оно не должно зависеть от объёма данных. С переменной
+окружения ``YATUBE_PERF_SCALE=100`` база заполняется в масштабе
+продакшена (тысячи пользователей, 100 тысяч постов и комментариев),
+и дополнительно проверяется p95 времени отклика. Если задана
+``YATUBE_PERF_REPORT``, результаты замеров записываются в этот файл
+в JSON, чтобы сравнивать их между коммитами.
+"""
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from about import urls as about_urls
+from users import urls as users_urls
+
+from .. import seeding, timeline
+from .. import urls as posts_urls
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+BUDGETS_PATH = Path(__file__).with_name("perf_budgets.json")
+SCALE = int(os.getenv("YATUBE_PERF_SCALE", "1"))
+RUNS = int(os.getenv("YATUBE_PERF_RUNS", "5"))
+REPORT_PATH = os.getenv("YATUBE_PERF_REPORT")
+
+USERS = 30 * SCALE
+GROUPS = 10
+POSTS = 1000 * SCALE
+COMMENTS = 1000 * SCALE
+FOLLOWS = 300 * SCALE
+
+URLCONFS = (posts_urls, users_urls, about_urls)
+# Адреса, которые открывает автор поста, а не читатель.
+AUTHOR_ROUTES = {"posts:post_edit"}
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    rank = math.ceil(percent / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+class PerformanceBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        users = seeding.seed(users=USERS, groups=GROUPS, posts=POSTS,
+                             comments=COMMENTS, follows=FOLLOWS, seed=0)
+        # Читатель подписан на самого популярного автора и смотрит
+        # самый обсуждаемый его пост.
+        cls.author = User.objects.get(pk=users[0])
+        cls.reader = User.objects.get(pk=users[-1])
+        Follow.objects.get_or_create(user=cls.reader, author=cls.author)
+        for author_id in cls.reader.follower.values_list("author", flat=True):
+            timeline.backfill(cls.reader.pk, author_id)
+        cls.post = (
+            Post.objects.filter(author=cls.author)
+            .annotate(comments_total=Count("comments"))
+            .order_by("-comments_total")
+            .first()
+        )
+        cls.group = Group.objects.order_by("pk").first()
+        # Подписка на второго автора создаётся и удаляется в замерах.
+        cls.target = User.objects.get(pk=users[1])
+        Follow.objects.filter(user=cls.reader, author=cls.target).delete()
+
+        with open(BUDGETS_PATH, encoding="utf-8") as budgets:
+            cls.budgets = json.load(budgets)
+
+    def route_kwargs(self, pattern):
+        values = {
+            "slug": self.group.slug,
+            "username": self.target.username,
+            "post_id": self.post.pk,
+            "uidb64": "MQ",
+            "token": "set-password",
+        }
+        if pattern.name in ("profile", "post_edit"):
+            values["username"] = self.author.username
+        return {
+            name: values[name] for name in pattern.pattern.converters
+        }
+
+    def routes(self):
+        for urlconf in URLCONFS:
+            for pattern in urlconf.urlpatterns:
+                name = f"{urlconf.app_name}:{pattern.name}"
+                url = reverse(name, kwargs=self.route_kwargs(pattern))
+                if name == "posts:search":
+                    url += "?q=город"
+                user = self.author if name in AUTHOR_ROUTES else self.reader
+                yield name, url, user
+
+    def measure(self, url, user):
+        """Запросы первого обращения и p95 времени по ``RUNS`` обращениям.
+
+        Перед каждым обращением кэши очищаются, чтобы замерять худший
+        случай, а не попадание во фрагментный кэш.
+        """
+        queries = None
+        timings = []
+        for _ in range(RUNS):
+            for alias in settings.CACHES:
+                caches[alias].clear()
+            client = Client()
+            client.force_login(user)
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            if queries is None:
+                queries = len(context)
+        return {
+            "url": url,
+            "status": response.status_code,
+            "queries": queries,
+            "p95_ms": round(percentile(timings, 95), 1),
+        }
+
+    def test_routes_within_budgets(self):
+        report = {}
+        for name, url, user in self.routes():
+            report[name] = result = self.measure(url, user)
+            budget = self.budgets.get(name)
+            with self.subTest(route=name):
+                self.assertIsNotNone(budget, "Для адреса не задан бюджет")
+                self.assertLess(result["status"], 400)
+                self.assertLessEqual(result["queries"], budget["queries"])
+                if SCALE > 1:
+                    self.assertLessEqual(result["p95_ms"], budget["p95_ms"])
+        if REPORT_PATH:
+            with open(REPORT_PATH, "w", encoding="utf-8") as output:
+                json.dump(
+                    {"scale": SCALE, "runs": RUNS, "routes": report},
+                    output, ensure_ascii=False, indent=2, sort_keys=True,
+                )
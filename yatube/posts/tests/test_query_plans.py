@@ -0,0 +1,83 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный просмотр таблицы приложения без индекса.
+FULL_SCAN = re.compile(
+    r"^SCAN (TABLE )?posts_\w+(?! USING (COVERING )?INDEX)( AS \w+)?$"
+)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN из SQLite")
+class QueryPlanTests(TestCase):
+    """Запросы страниц приложения должны использовать индексы."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="reader")
+        cls.author = User.objects.create_user(username="author")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(author=cls.author, text=f"Текст {i}",
+                                       group=cls.group)
+            Comment.objects.create(post=post, author=cls.user, text="Ок")
+        cls.post = post
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def full_scans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        scans = []
+        for query in context.captured_queries:
+            if not query["sql"].startswith("SELECT"):
+                continue
+            for step in self.explain(query["sql"]):
+                if FULL_SCAN.match(step):
+                    scans.append((step, query["sql"]))
+        return scans
+
+    def test_views_use_indexes(self):
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": "test-slug"}),
+            reverse("posts:profile", kwargs={"username": "author"}),
+            reverse("posts:post_detail", kwargs={"post_id": self.post.pk}),
+            reverse("posts:follow_index"),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.full_scans(url), [])
+
+    def test_follow_feed_is_read_in_index_order(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse("posts:follow_index"))
+        feed_sql = [query["sql"] for query in context.captured_queries
+                    if "posts_timelineentry" in query["sql"]][-1]
+        plan = self.explain(feed_sql)
+        self.assertTrue(any("timeline_user_pub_date_idx" in step
+                            for step in plan), plan)
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
@@ -0,0 +1,130 @@
+from io import StringIO
+from unittest import SkipTest
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, SearchPosting
+
+User = get_user_model()
+
+
+class SearchBackendMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+
+    def setUp(self):
+        self.client = Client()
+
+    def create_post(self, text):
+        return Post.objects.create(author=self.user, text=text)
+
+    def found(self, query):
+        return [post.pk for post in search.search(query, limit=100)]
+
+    def test_all_terms_must_match(self):
+        both = self.create_post("Ёлка и снег")
+        self.create_post("Только ёлка")
+        self.assertEqual(self.found("снег ЕЛКА"), [both.pk])
+
+    def test_text_ranks_above_comments(self):
+        commented = self.create_post("Про погоду")
+        Comment.objects.create(post=commented, author=self.user,
+                               text="А у нас дождь")
+        in_text = self.create_post("Сильный дождь")
+        self.assertEqual(self.found("дождь"), [in_text.pk, commented.pk])
+
+    def test_index_follows_edit_and_delete(self):
+        post = self.create_post("Старый текст")
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text="комментарий")
+        post.text = "Новый текст"
+        post.save()
+        self.assertEqual(self.found("старый"), [])
+        self.assertEqual(self.found("новый комментарий"), [post.pk])
+        comment.delete()
+        self.assertEqual(self.found("комментарий"), [])
+        post.delete()
+        self.assertEqual(self.found("новый"), [])
+
+    def test_comment_updates_match_rebuild(self):
+        post = self.create_post("Про погоду")
+        first = Comment.objects.create(post=post, author=self.user,
+                                       text="Дождь и снег")
+        Comment.objects.create(post=post, author=self.user,
+                               text="Снег, снег")
+        first.delete()
+        Comment.objects.create(post=post, author=self.user, text="Ветер")
+        indexed = self.document(post)
+        search.rebuild()
+        self.assertEqual(self.document(post), indexed)
+        self.assertEqual(self.found("дождь"), [])
+        self.assertEqual(self.found("снег ветер"), [post.pk])
+
+    def test_rebuild_command(self):
+        post = self.create_post("Текст для индекса")
+        search.get_backend().clear()
+        self.assertEqual(self.found("индекса"), [])
+        call_command("rebuild_search_index", batch_size=1, stdout=StringIO())
+        self.assertEqual(self.found("индекса"), [post.pk])
+
+    def test_search_view_is_paginated(self):
+        for i in range(12):
+            self.create_post(f"Пост про кошек {i}")
+        response = self.client.get(reverse("posts:search"), {"q": "кошек"})
+        page_obj = response.context["page_obj"]
+        self.assertEqual(len(page_obj), 10)
+        self.assertTrue(page_obj.has_next())
+        response = self.client.get(
+            reverse("posts:search"), {"q": "кошек", "page": 2}
+        )
+        self.assertEqual(len(response.context["page_obj"]), 2)
+        self.assertFalse(response.context["page_obj"].has_next())
+
+    def test_empty_query(self):
+        response = self.client.get(reverse("posts:search"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["page_obj"])
+
+
+@override_settings(POSTS_SEARCH_BACKEND="python")
+class PythonSearchTests(SearchBackendMixin, TestCase):
+    def test_postings_are_stored(self):
+        post = self.create_post("Кот и кот")
+        posting = SearchPosting.objects.get(post=post, term="кот")
+        self.assertEqual(posting.weight, 2 * search.TEXT_WEIGHT)
+
+    def document(self, post):
+        return set(SearchPosting.objects.filter(post=post).values_list(
+            "term", "weight"
+        ))
+
+
+@override_settings(POSTS_SEARCH_BACKEND="fts5")
+class FTS5SearchTests(SearchBackendMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if not search.fts5_available():
+            raise SkipTest("SQLite собран без FTS5")
+        super().setUpClass()
+
+    def document(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT text, comments FROM {search.FTS_TABLE} "
+                f"WHERE rowid = %s",
+                [post.pk],
+            )
+            text, comments = cursor.fetchone()
+        return text, sorted(comments.split())
+
+    def test_build_options_are_read_once(self):
+        search.fts5_available()
+        with self.assertNumQueries(0):
+            self.assertTrue(search.fts5_available())
@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.testing import execute_on_commit
+from .. import caching, search, seeding
+from ..models import AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class SeedCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.output = StringIO()
+        call_command(
+            "seed_yatube",
+            users=50,
+            groups=3,
+            posts=300,
+            comments=200,
+            follows=400,
+            days=30,
+            seed=1,
+            batch_size=64,
+            stdout=cls.output,
+        )
+
+    def test_creates_requested_rows(self):
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertGreater(Follow.objects.count(), 0)
+        self.assertLessEqual(Follow.objects.count(), 400)
+        self.assertIn("Готово", self.output.getvalue())
+
+    def test_dates_are_spread(self):
+        dates = Post.objects.values_list("pub_date", flat=True)
+        self.assertGreater((max(dates) - min(dates)).days, 7)
+        for comment in Comment.objects.select_related("post"):
+            self.assertGreaterEqual(comment.created, comment.post.pub_date)
+
+    def test_followers_are_skewed(self):
+        counts = list(
+            AuthorStats.objects.order_by("-followers_count")
+            .values_list("followers_count", flat=True)
+        )
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+
+    def test_derived_data_is_built(self):
+        author = User.objects.order_by("pk").first()
+        self.assertEqual(AuthorStats.objects.for_user(author).posts_count,
+                         author.posts.count())
+        follow = Follow.objects.first()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user_id=follow.user_id, post__author_id=follow.author_id
+        ).exists())
+        self.assertTrue(search.search("город"))
+
+    def test_page_versions_are_bumped_without_clearing_cache(self):
+        cache = caches[caching.INDEX_CACHE]
+        cache.set("unrelated", 1)
+        index_version = caching.get_version(caching.INDEX)
+        group = Group.objects.first()
+        group_version = caching.get_version(caching.GROUP, group.pk)
+        with execute_on_commit():
+            seeding.seed(users=0, groups=0, posts=5, comments=0, follows=0,
+                         seed=2)
+        self.assertNotEqual(caching.get_version(caching.INDEX),
+                            index_version)
+        self.assertEqual(caching.get_version(caching.GROUP, group.pk),
+                         group_version)
+        self.assertEqual(cache.get("unrelated"), 1)
+
+    def test_only_authors_with_new_rows_are_bumped(self):
+        idle = User.objects.create_user(username="idle")
+        idle_version = caching.get_version(caching.AUTHOR, idle.pk)
+        with execute_on_commit():
+            seeding.seed(users=0, groups=1, posts=0, comments=0, follows=0,
+                         seed=2)
+        self.assertEqual(caching.get_version(caching.AUTHOR, idle.pk),
+                         idle_version)
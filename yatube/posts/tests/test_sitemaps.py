@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+TEMP_SITEMAP_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+NS = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+
+
+@override_settings(SITEMAP_ROOT=TEMP_SITEMAP_ROOT,
+                   SITE_URL="https://yatube.example")
+class BuildSitemapsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="auth")
+        User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        for i in range(5):
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f"Пост {i}")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_SITEMAP_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def build(self, **options):
+        call_command("build_sitemaps", stdout=StringIO(), **options)
+
+    def parse(self, name):
+        return ElementTree.parse(os.path.join(TEMP_SITEMAP_ROOT, name))
+
+    def locations(self, name):
+        return [loc.text for loc in self.parse(name).iterfind(".//sm:loc",
+                                                              NS)]
+
+    def test_index_lists_shards(self):
+        self.build(shard_size=2)
+        self.assertEqual(self.locations("sitemap.xml"), [
+            "https://yatube.example/sitemaps/sitemap-posts-1.xml",
+            "https://yatube.example/sitemaps/sitemap-posts-2.xml",
+            "https://yatube.example/sitemaps/sitemap-posts-3.xml",
+            "https://yatube.example/sitemaps/sitemap-groups-1.xml",
+            "https://yatube.example/sitemaps/sitemap-profiles-1.xml",
+        ])
+
+    def test_urls_and_lastmod(self):
+        self.build()
+        post = Post.objects.order_by("pk").first()
+        posts = self.parse("sitemap-posts-1.xml").findall("sm:url", NS)
+        self.assertEqual(len(posts), 5)
+        self.assertEqual(
+            posts[0].find("sm:loc", NS).text,
+            f"https://yatube.example/posts/{post.pk}/",
+        )
+        self.assertEqual(
+            posts[0].find("sm:lastmod", NS).text,
+            post.pub_date.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+        )
+        self.assertEqual(self.locations("sitemap-groups-1.xml"),
+                         ["https://yatube.example/group/test-slug/"])
+        # Профили без постов в карту не попадают.
+        self.assertEqual(self.locations("sitemap-profiles-1.xml"),
+                         ["https://yatube.example/profile/auth/"])
+
+    def test_rebuild_removes_stale_shards(self):
+        self.build(shard_size=2)
+        self.build()
+        names = sorted(os.listdir(TEMP_SITEMAP_ROOT))
+        self.assertEqual(names, [
+            "sitemap-groups-1.xml",
+            "sitemap-posts-1.xml",
+            "sitemap-profiles-1.xml",
+            "sitemap.xml",
+        ])
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class AuthorStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_new_user_has_zero_stats(self):
+        stats = AuthorStats.objects.for_user(self.reader)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_posts_count_follows_create_and_delete(self):
+        post = Post.objects.create(author=self.author, text="Текст")
+        Post.objects.create(author=self.author, text="Текст")
+        self.assertEqual(self.get_stats(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+
+    def test_comments_count_follows_add_comment(self):
+        post = Post.objects.create(author=self.author, text="Текст")
+        self.reader_client.post(
+            reverse("posts:add_comment", kwargs={"post_id": post.pk}),
+            {"text": "Комментарий"},
+        )
+        self.assertEqual(self.get_stats(self.reader).comments_count, 1)
+        Comment.objects.get(post=post).delete()
+        self.assertEqual(self.get_stats(self.reader).comments_count, 0)
+
+    def test_follow_without_author_counts_only_follower(self):
+        follow = Follow.objects.create(user=self.reader, author=None)
+        self.assertEqual(self.get_stats(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.get_stats(self.reader).following_count, 0)
+
+    def test_follow_counts_follow_views(self):
+        follow_url = reverse("posts:profile_follow",
+                             kwargs={"username": "author"})
+        unfollow_url = reverse("posts:profile_unfollow",
+                               kwargs={"username": "author"})
+        self.reader_client.get(follow_url)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.assertEqual(self.get_stats(self.reader).following_count, 1)
+        self.reader_client.get(unfollow_url)
+        self.assertEqual(self.get_stats(self.author).followers_count, 0)
+        self.assertEqual(self.get_stats(self.reader).following_count, 0)
+
+    def test_profile_and_post_detail_do_not_count_posts(self):
+        post = Post.objects.create(author=self.author, text="Текст")
+        urls = (
+            reverse("posts:profile", kwargs={"username": "author"}),
+            reverse("posts:post_detail", kwargs={"post_id": post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(response.context["post_number"], 1)
+
+    def test_rebuild_command_fixes_drift(self):
+        Post.objects.create(author=self.author, text="Текст")
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(
+            posts_count=10, followers_count=10
+        )
+        call_command("rebuild_author_stats", stdout=StringIO())
+        stats = self.get_stats(self.author)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(self.get_stats(self.reader).following_count, 1)
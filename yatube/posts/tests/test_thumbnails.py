@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.testing import execute_on_commit
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches["index_page"].clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text="Тестовый текст",
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        response = self.client.get(reverse("posts:index"))
+        self.assertIsNone(response.context["page_obj"][0].thumbnail)
+        self.assertContains(response, "aspect-ratio: 960 / 339")
+
+    def test_submit_stores_thumbnail(self):
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        variant = post.thumbnail
+        self.assertEqual((variant["width"], variant["height"]), (960, 339))
+        self.assertTrue(default_storage.exists(variant["name"]))
+        response = self.client.get(reverse("posts:index"))
+        self.assertContains(response, variant["url"])
+
+    def test_all_sizes_and_formats_are_rendered(self):
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        rendered = {(v["geometry"], v["format"]) for v in post.thumbnails}
+        self.assertEqual(rendered, set(thumbnails.specs()))
+        for variant in post.thumbnails:
+            with self.subTest(variant=variant["name"]):
+                self.assertEqual(
+                    "{width}x{height}".format(**variant), variant["geometry"]
+                )
+                self.assertTrue(default_storage.exists(variant["name"]))
+
+    @override_settings(POST_IMAGE_FORMATS=["WEBP", "JPEG"])
+    def test_picture_markup(self):
+        if ("960x339", "WEBP") not in thumbnails.specs():
+            self.skipTest("Pillow собран без поддержки WebP")
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        response = self.client.get(reverse("posts:index"))
+        picture = response.context["page_obj"][0].picture
+        self.assertEqual([source["type"] for source in picture["sources"]],
+                         ["image/webp"])
+        self.assertEqual(picture["srcset"].count("w,"),
+                         len(settings.POST_THUMBNAIL_GEOMETRIES) - 1)
+        self.assertContains(response, "<picture>")
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_result_for_replaced_image_is_dropped(self):
+        thumbnails.store(self.post.pk, "posts/other.gif",
+                         [("960x339", "JPEG")], [(960, 339)])
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).image_variants, ""
+        )
+
+    def test_schedule_resets_thumbnails(self):
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        thumbnails.schedule(self.post)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).image_variants, ""
+        )
+
+    def test_generate_thumbnails_command(self):
+        call_command("generate_thumbnails", stdout=StringIO())
+        self.assertIsNotNone(Post.objects.get(pk=self.post.pk).thumbnail)
+
+    def test_image_saved_outside_views_gets_thumbnails(self):
+        with execute_on_commit():
+            post = Post.objects.create(
+                author=self.user,
+                text="Из админки",
+                image=SimpleUploadedFile("admin.gif", SMALL_GIF, "image/gif"),
+            )
+        self.assertIsNotNone(Post.objects.get(pk=post.pk).thumbnail)
+
+    def test_save_without_new_image_keeps_thumbnails(self):
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = "Новый текст"
+        with execute_on_commit():
+            post.save()
+        self.assertIsNotNone(Post.objects.get(pk=self.post.pk).thumbnail)
+
+    def test_build_missing_shares_variants_of_one_image(self):
+        copy = Post.objects.create(author=self.user, text="Копия",
+                                   image=self.post.image.name)
+
+        self.assertEqual(thumbnails.build_missing(), 2)
+
+        self.assertEqual(Post.objects.get(pk=copy.pk).image_variants,
+                         Post.objects.get(pk=self.post.pk).image_variants)
+        self.assertFalse(thumbnails.missing().exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_WORKERS=1)
+class ThumbnailPoolTests(TransactionTestCase):
+    def test_pool_result_is_stored_without_a_request(self):
+        user = User.objects.create_user(username="auth")
+        post = Post.objects.create(
+            author=user,
+            text="Тестовый текст",
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+        # Вне транзакции пост сразу заказал варианты, а пул сохранит их
+        # сам, без сигнала об окончании запроса.
+        thumbnails.shutdown()
+        variant = Post.objects.get(pk=post.pk).thumbnail
+        self.assertTrue(os.path.exists(default_storage.path(variant["name"])))
+
+    @override_settings(POST_IMAGE_MAX_PENDING=0)
+    def test_orders_over_the_limit_are_left_for_build_missing(self):
+        user = User.objects.create_user(username="auth")
+        post = Post.objects.create(
+            author=user,
+            text="Тестовый текст",
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+        thumbnails.shutdown()
+        self.assertTrue(thumbnails.missing().filter(pk=post.pk).exists())
+
+        self.assertEqual(thumbnails.build_missing(), 1)
+        self.assertIsNotNone(Post.objects.get(pk=post.pk).thumbnail)
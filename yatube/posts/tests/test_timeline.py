@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import jobs
+from core.testing import execute_on_commit
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import followed_posts
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username="reader")
+        cls.author = User.objects.create_user(username="author")
+        cls.other = User.objects.create_user(username="other")
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_feed(self):
+        response = self.reader_client.get(reverse("posts:follow_index"))
+        return list(response.context["page_obj"])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text="Текст")
+        Post.objects.create(author=self.other, text="Чужой пост")
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.get_feed(), [post])
+
+    @override_settings(JOBS_ENABLED=True, PAGE_CACHE_SHARED=True)
+    def test_feed_etag_changes_after_fan_out(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with execute_on_commit():
+            post = Post.objects.create(author=self.author, text="Текст")
+        url = reverse("posts:follow_index")
+        etag = self.reader_client.get(url)["ETag"]
+        self.assertEqual(self.get_feed(), [])
+
+        with execute_on_commit():
+            jobs.Worker().run_pending()
+
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["page_obj"]), [post])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        posts = [
+            Post.objects.create(author=self.author, text=f"Текст {i}")
+            for i in range(3)
+        ]
+        self.reader_client.get(
+            reverse("posts:profile_follow", kwargs={"username": "author"})
+        )
+        self.assertEqual(self.get_feed(), posts[::-1])
+        self.reader_client.get(
+            reverse("posts:profile_unfollow", kwargs={"username": "author"})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=2)
+    def test_backfill_is_limited(self):
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f"Текст {i}")
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_pulled(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text="Текст")
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(list(followed_posts(self.reader)), [post])
+        self.assertEqual(self.get_feed(), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_former_popular_author_posts_are_refilled(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        fan = Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(author=self.author, text="Текст")
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        fan.delete()
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_feed_pages_by_timeline_cursor(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f"Текст {i}")
+            for i in range(settings.PAGE_SIZE + 2)
+        ][::-1]
+        url = reverse("posts:follow_index")
+        first = self.reader_client.get(url).context["page_obj"]
+        self.assertEqual(list(first), posts[:settings.PAGE_SIZE])
+        second = self.reader_client.get(
+            url, {"after": first.paginator.next_cursor}
+        ).context["page_obj"]
+        self.assertEqual(list(second), posts[settings.PAGE_SIZE:])
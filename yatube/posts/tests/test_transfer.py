@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import transfer
+from ..models import AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.author = User.objects.create_user(username="auth",
+                                               password="secret")
+        self.reader = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        for i in range(5):
+            Post.objects.create(author=self.author, group=self.group,
+                                text=f"Пост {i}")
+        self.post = Post.objects.create(author=self.reader, text="Без группы")
+        Comment.objects.create(post=self.post, author=self.author,
+                               text="Комментарий")
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def path(self, name="dump.jsonl"):
+        return os.path.join(self.root, name)
+
+    def export(self, path):
+        call_command("export_yatube", path, stdout=StringIO())
+
+    def load(self, path, **options):
+        output = StringIO()
+        call_command("import_yatube", path, stdout=output, **options)
+        return output.getvalue()
+
+    def snapshot(self):
+        return {
+            "users": sorted(User.objects.values_list("username", "password")),
+            "groups": sorted(Group.objects.values_list("slug", "title")),
+            "posts": sorted(Post.objects.values_list(
+                "author__username", "group__slug", "text", "pub_date"
+            ), key=str),
+            "comments": sorted(Comment.objects.values_list(
+                "post__text", "author__username", "text", "created"
+            )),
+            "follows": sorted(Follow.objects.values_list(
+                "user__username", "author__username"
+            )),
+        }
+
+    def clear(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_round_trip_into_empty_database(self):
+        before = self.snapshot()
+        self.export(self.path())
+        self.clear()
+
+        output = self.load(self.path())
+
+        self.assertEqual(self.snapshot(), before)
+        self.assertIn("posts 6", output)
+        author = User.objects.get(username="auth")
+        self.assertTrue(author.check_password("secret"))
+        self.assertEqual(AuthorStats.objects.for_user(author).posts_count, 5)
+        reader = User.objects.get(username="reader")
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 5)
+        self.assertFalse(os.path.exists(self.path() + ".checkpoint"))
+
+    def test_gzip_file(self):
+        before = self.snapshot()
+        path = self.path("dump.jsonl.gz")
+        self.export(path)
+        with open(path, "rb") as dump:
+            self.assertEqual(dump.read(2), b"\x1f\x8b")
+        self.clear()
+
+        self.load(path)
+
+        self.assertEqual(self.snapshot(), before)
+
+    def test_import_into_non_empty_database(self):
+        self.export(self.path())
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.filter(username="reader").delete()
+        newcomer = User.objects.create_user(username="newcomer")
+        Post.objects.create(author=newcomer, text="Уже был")
+
+        self.load(self.path())
+
+        # Существующие пользователь и группа не задваиваются: посты
+        # выгрузки ссылаются на них.
+        self.assertEqual(User.objects.filter(username="auth").count(), 1)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(self.group.posts.count(), 5)
+        self.assertEqual(self.author.posts.count(), 5)
+        self.assertTrue(Post.objects.filter(text="Уже был",
+                                            author=newcomer).exists())
+        reader = User.objects.get(username="reader")
+        self.assertTrue(Follow.objects.filter(user=reader,
+                                              author=self.author).exists())
+        self.assertEqual(Comment.objects.get().post.author, reader)
+
+    def test_import_twice_into_database_with_same_users(self):
+        self.export(self.path())
+
+        self.load(self.path())
+        self.load(self.path())
+
+        self.assertEqual(User.objects.filter(username="reader").count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.author.posts.count(), 15)
+        self.assertFalse(os.path.exists(self.path() + ".checkpoint"))
+
+    def test_rows_created_during_import_keep_out_of_its_keys(self):
+        rows = [
+            {"type": "users", "id": 1, "username": "old", "password": "!",
+             "email": "", "first_name": "", "last_name": "",
+             "is_active": True, "is_staff": False, "is_superuser": False,
+             "date_joined": "2020-01-01T00:00:00+00:00",
+             "last_login": None},
+            {"type": "posts", "id": 1, "author_id": 1, "group_id": None,
+             "text": "Старый пост", "pub_date": "2020-01-01T00:00:00+00:00",
+             "image": "", "image_variants": ""},
+            {"type": "comments", "id": 1, "post_id": 1, "author_id": 1,
+             "text": "Старый комментарий",
+             "created": "2020-01-02T00:00:00+00:00"},
+        ]
+        with open(self.path(), "w", encoding="utf-8") as dump:
+            dump.writelines(json.dumps(row) + "\n" for row in rows)
+
+        def write_meanwhile(kind, count):
+            # Сайт работает: новые строки получают следующие ключи.
+            if kind == "users":
+                post = Post.objects.create(author=self.author, text="Живой")
+                Comment.objects.create(post=post, author=self.author,
+                                       text="Живой комментарий")
+
+        transfer.load(self.path(), log=write_meanwhile)
+
+        old = Post.objects.get(text="Старый пост")
+        self.assertEqual(old.author.username, "old")
+        self.assertEqual(old.comments.get().text, "Старый комментарий")
+        live = Post.objects.get(text="Живой")
+        self.assertEqual(live.comments.get().text, "Живой комментарий")
+
+    def test_resumes_from_checkpoint(self):
+        before = self.snapshot()
+        self.export(self.path())
+        self.clear()
+        checkpoint = self.path() + ".checkpoint"
+
+        def fail_after_posts(kind, count):
+            if kind == "posts" and count == 4:
+                raise Interrupted
+
+        with self.assertRaises(Interrupted):
+            transfer.load(self.path(), checkpoint_path=checkpoint,
+                          batch_size=2, log=fail_after_posts)
+        self.assertTrue(os.path.exists(checkpoint))
+        self.assertEqual(Post.objects.count(), 4)
+
+        counts = transfer.load(self.path(), checkpoint_path=checkpoint,
+                               batch_size=2)
+
+        self.assertEqual(counts["posts"], 4)
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(os.path.exists(checkpoint))
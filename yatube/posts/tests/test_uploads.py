@@ -0,0 +1,103 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_ORIENTATION = 0x0112
+EXIF_MAKE = 0x010F
+
+
+def make_image(size, image_format="JPEG", exif=None):
+    buffer = BytesIO()
+    image = Image.new("RGB", size, "white")
+    options = {"exif": exif} if exif is not None else {}
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_WORKERS=0)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, content, name="photo.jpg"):
+        return self.authorized_client.post(
+            reverse("posts:post_create"),
+            data={
+                "text": "Тестовый текст",
+                "image": SimpleUploadedFile(name, content, "image/jpeg"),
+            },
+        )
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_is_rejected(self):
+        content = make_image((300, 300), "PNG") + b"\0" * 2048
+        response = self.upload(content, "photo.png")
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, "form", "image",
+            "Размер картинки не должен превышать 1,0\xa0КБ",
+        )
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_file_sent_before_other_fields_is_rejected(self):
+        content = make_image((300, 300), "PNG") + b"\0" * 2048
+        # Загрузка обрывается на первой части, и текст до сервера не
+        # доходит.
+        response = self.authorized_client.post(
+            reverse("posts:post_create"),
+            data={
+                "image": SimpleUploadedFile("photo.png", content, "image/png"),
+                "text": "Тестовый текст",
+            },
+        )
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, "form", "image",
+            "Размер картинки не должен превышать 1,0\xa0КБ",
+        )
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_is_rejected(self):
+        response = self.upload(make_image((200, 200)))
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, "form", "image", "Слишком большое разрешение картинки"
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_large_image_is_downscaled(self):
+        self.upload(make_image((400, 200)))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (100, 50))
+
+    def test_exif_is_stripped_after_rotation(self):
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        exif[EXIF_MAKE] = "Camera"
+        self.upload(make_image((40, 20), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertEqual(len(image.getexif()), 0)
@@ -4,12 +4,14 @@ import tempfile
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.testing import execute_on_commit
 from ..models import Comment, Follow, Group, Post
+from ..storage import post_images
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -21,7 +23,6 @@ class PostPagesTests(TestCase):
     post_author = "auth"
     post_group = "Тестовая группа"
     group_description = "Тестовое описание"
-    image = "posts/small.gif"
     comment_text = "Текст комментария"
 
     @classmethod
@@ -52,6 +53,7 @@ class PostPagesTests(TestCase):
             group=cls.group,
             image=uploaded,
         )
+        cls.image = post_images.content_name("posts/small.gif", uploaded)
         cls.comment_user = Comment.objects.create(
             post=cls.post_user,
             author=cls.user,
@@ -335,25 +337,48 @@ class PostCacheIndexViewTests(TestCase):
         )
 
     def setUp(self) -> None:
+        caches["index_page"].clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
+    def get_index(self, client, **params):
+        return client.get(reverse("posts:index"), params).content
+
     def test_cache_of_home_page(self):
-        response_post_exits = (self.guest_client.get(reverse
-                                                     ("posts:index"))
-                               .content)
-        self.post_user.delete()
-        response_post_deleted = (self.guest_client.get(reverse
-                                                       ("posts:index"))
-                                 .content)
-        self.assertEqual(response_post_exits, response_post_deleted)
-        cache.clear()
-        response_cache_cleared = (self.guest_client.get(reverse
-                                                        ("posts:index"))
-                                  .content)
+        response_post_exits = self.get_index(self.guest_client)
+        # update() не отправляет сигналов: страница берётся из кэша.
+        Post.objects.filter(pk=self.post_user.pk).update(text="Изменено")
+        response_post_updated = self.get_index(self.guest_client)
+        self.assertEqual(response_post_exits, response_post_updated)
+        caches["index_page"].clear()
+        response_cache_cleared = self.get_index(self.guest_client)
         self.assertNotEqual(response_post_exits, response_cache_cleared)
 
+    def test_cache_invalidated_on_post_changes(self):
+        response_before = self.get_index(self.guest_client)
+        with execute_on_commit():
+            new_post = Post.objects.create(author=self.user,
+                                           text="Новый пост")
+        response_created = self.get_index(self.guest_client)
+        self.assertNotEqual(response_before, response_created)
+        self.assertIn(new_post.text.encode(), response_created)
+        with execute_on_commit():
+            new_post.delete()
+        response_deleted = self.get_index(self.guest_client)
+        self.assertNotIn(new_post.text.encode(), response_deleted)
+
+    def test_cache_varies_on_page_and_auth_state(self):
+        for i in range(settings.PAGE_SIZE):
+            Post.objects.create(author=self.user, text=f"Пост {i}")
+        first_page = self.get_index(self.guest_client)
+        second_page = self.get_index(self.guest_client, page=2)
+        self.assertNotEqual(first_page, second_page)
+        self.assertIn(self.post_text.encode(), second_page)
+        switcher = "Избранные авторы".encode()
+        self.assertNotIn(switcher, first_page)
+        self.assertIn(switcher, self.get_index(self.authorized_client))
+
 
 class PostFollowViewTests(TestCase):
     @classmethod
@@ -421,3 +446,43 @@ class PostFollowViewTests(TestCase):
             content_following_post_for_guest_user,
             "Контент для гостевого юзера не является ожидаемым",
         )
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        for i in range(settings.PAGE_SIZE + 1):
+            author = User.objects.create_user(username=f"author{i}")
+            Post.objects.create(author=author, text="Тестовый текст",
+                                group=cls.group)
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self) -> None:
+        cache.clear()
+        caches["index_page"].clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_pages_query_budget(self):
+        pages = {
+            reverse("posts:index"): 1,
+            reverse("posts:group_list", kwargs={"slug": "test-slug"}): 2,
+            reverse("posts:profile", kwargs={"username": "author0"}): 2,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.guest_client.get(url)
+
+    def test_follow_page_query_budget(self):
+        # Сессия и пользователь, подписки на «звёзд», затем одна выборка
+        # постов.
+        with self.assertNumQueries(4):
+            self.authorized_client.get(reverse("posts:follow_index"))
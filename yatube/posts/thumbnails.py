@@ -0,0 +1,273 @@
+"""Заранее построенные варианты картинок постов.
+
+Для каждой картинки строятся варианты нескольких размеров в
+современных форматах (WebP, AVIF) и в JPEG. Варианты заказываются
+после сохранения поста с новой картинкой, откуда бы оно ни пришло
+(см. ``posts.signals``), и строятся в пуле процессов, а не при первом
+показе страницы. Результат сохраняется, как только пул его вернёт,
+поэтому ни запрос, ни воркер рендеров не ждут. Чтобы процесс не копил
+невыполненную работу, в пуле одновременно бывает не больше
+``POST_IMAGE_MAX_PENDING`` заказов; остальные посты остаются без
+вариантов до ``generate_thumbnails``.
+С ``JOBS_ENABLED`` варианты вместо пула строит обработчик очереди
+фоновых задач (см. ``core.jobs``).
+Пока варианты не готовы, шаблоны выводят заглушку.
+
+Заказ в пуле живёт только в памяти процесса: если процесс завершился
+раньше, чем пул построил варианты, или посты создавались без сигналов
+(``seed_yatube``, ``import_yatube``), у поста остаётся картинка без
+вариантов. Такие посты находит и достраивает команда
+``generate_thumbnails``; её стоит запускать по расписанию.
+
+Варианты лежат рядом с именем исходной картинки, а не поста, поэтому
+посты с одной и той же картинкой делят один набор вариантов.
+"""
+import json
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from core import jobs
+from . import caching, imaging
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp", "AVIF": "avif"}
+
+
+def parse_geometry(geometry):
+    width, height = geometry.split("x")
+    return int(width), int(height)
+
+
+def variant_dir(image_name):
+    return posixpath.join("cache", posixpath.splitext(image_name)[0])
+
+
+def variant_name(image_name, geometry, image_format):
+    return posixpath.join(
+        variant_dir(image_name), f"{geometry}.{EXTENSIONS[image_format]}"
+    )
+
+
+def delete_variants(image_name):
+    directory = variant_dir(image_name)
+    if not default_storage.exists(directory):
+        return
+    for name in default_storage.listdir(directory)[1]:
+        default_storage.delete(posixpath.join(directory, name))
+    try:
+        os.rmdir(default_storage.path(directory))
+    except OSError:
+        pass
+
+
+def specs():
+    """Пары (геометрия, формат) всех вариантов, которые нужно построить.
+
+    Форматы, которые не поддерживает установленный Pillow, пропускаются;
+    JPEG нужен всегда как запасной вариант для ``<img>``.
+    """
+    formats = imaging.available_formats(settings.POST_IMAGE_FORMATS)
+    if "JPEG" not in formats:
+        formats.append("JPEG")
+    return [
+        (geometry, image_format)
+        for geometry in settings.POST_THUMBNAIL_GEOMETRIES
+        for image_format in formats
+    ]
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.POST_IMAGE_WORKERS
+        )
+    return _executor
+
+
+def schedule(post):
+    """Сбрасывает старые варианты картинки поста и заказывает новые.
+
+    Работа начинается только после фиксации транзакции, чтобы пул не
+    увидел ещё не сохранённый файл.
+    """
+    Post.objects.filter(pk=post.pk).update(image_variants="")
+    post.image_variants = ""
+    if post.image:
+        transaction.on_commit(partial(order, post.pk, post.image.name))
+
+
+def order(post_id, image_name):
+    """Заказывает варианты, не мешая сохранению поста.
+
+    Пост уже сохранён, поэтому ошибка здесь только записывается в лог,
+    а варианты потом достроит ``generate_thumbnails``.
+    """
+    try:
+        submit(post_id, image_name)
+    except Exception:
+        logger.exception("Не удалось заказать миниатюры поста %s", post_id)
+
+
+def render_args(image_name, variant_specs):
+    targets = [
+        (default_storage.path(variant_name(image_name, geometry,
+                                           image_format)),
+         *parse_geometry(geometry), image_format)
+        for geometry, image_format in variant_specs
+    ]
+    return Post.image.field.storage.path(image_name), targets
+
+
+def render(image_name, variant_specs):
+    """Строит варианты в текущем процессе и возвращает их размеры."""
+    return imaging.render_variants(*render_args(image_name, variant_specs))
+
+
+def build(post_id, image_name):
+    """Строит варианты в текущем процессе; фоновая задача."""
+    variant_specs = specs()
+    if not reuse(post_id, image_name, variant_specs):
+        store(post_id, image_name, variant_specs,
+              render(image_name, variant_specs))
+
+
+def submit(post_id, image_name):
+    if settings.JOBS_ENABLED:
+        jobs.enqueue(build, post_id, image_name)
+        return
+    if not settings.POST_IMAGE_WORKERS:
+        build(post_id, image_name)
+        return
+    variant_specs = specs()
+    if reuse(post_id, image_name, variant_specs):
+        return
+    if not reserve():
+        logger.warning(
+            "Пул миниатюр занят, пост %s ждёт generate_thumbnails", post_id
+        )
+        return
+    try:
+        future = get_executor().submit(
+            imaging.render_variants, *render_args(image_name, variant_specs)
+        )
+    except Exception:
+        release()
+        raise
+    future.add_done_callback(
+        partial(collect, post_id, image_name, variant_specs)
+    )
+
+
+def reserve():
+    """Занимает место в пуле, если заказов меньше предела."""
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.POST_IMAGE_MAX_PENDING:
+            return False
+        _pending += 1
+        return True
+
+
+def release():
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def collect(post_id, image_name, variant_specs, future):
+    """Сохраняет результат пула; вызывается в служебном потоке пула."""
+    try:
+        store(post_id, image_name, variant_specs, future.result())
+    except Exception:
+        logger.exception("Не удалось построить миниатюры поста %s", post_id)
+    finally:
+        release()
+        # Соединения с базой у каждого потока свои, а этот поток не
+        # обслуживает запросы, после которых они закрываются.
+        connections.close_all()
+
+
+def shutdown():
+    """Дожидается заказанных в пуле вариантов и останавливает пул."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def missing():
+    """Посты с картинкой, у которых нет готовых вариантов."""
+    return Post.objects.exclude(image="").filter(image_variants="")
+
+
+def build_missing():
+    """Достраивает варианты постов из ``missing``; возвращает их число.
+
+    Посты с одной картинкой получают варианты, построенные для первого
+    из них.
+    """
+    posts = list(missing().order_by("pk").values_list("pk", "image"))
+    for post_id, image_name in posts:
+        build(post_id, image_name)
+    return len(posts)
+
+
+def reuse(post_id, image_name, variant_specs):
+    """Берёт готовые варианты у другого поста с той же картинкой."""
+    ready = (
+        Post.objects.filter(image=image_name)
+        .exclude(pk=post_id)
+        .exclude(image_variants="")
+        .values_list("image_variants", flat=True)
+        .first()
+    )
+    if ready is None:
+        return False
+    variants = json.loads(ready)
+    if [(v["geometry"], v["format"]) for v in variants] != variant_specs:
+        return False
+    save_variants(post_id, image_name, variants)
+    return True
+
+
+def store(post_id, image_name, variant_specs, sizes):
+    variants = [
+        {
+            "geometry": geometry,
+            "format": image_format,
+            "name": variant_name(image_name, geometry, image_format),
+            "width": width,
+            "height": height,
+        }
+        for (geometry, image_format), (width, height)
+        in zip(variant_specs, sizes)
+    ]
+    save_variants(post_id, image_name, variants)
+
+
+def save_variants(post_id, image_name, variants):
+    # Если картинку успели заменить, результат уже не нужен.
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        image_variants=json.dumps(variants)
+    )
+    if updated:
+        author_id, group_id = Post.objects.filter(pk=post_id).values_list(
+            "author_id", "group_id"
+        ).get()
+        caching.bump_post_scopes(post_id, author_id, group_id)
@@ -0,0 +1,136 @@
+"""Материализованные ленты подписок.
+
+Новый пост раскладывается по лентам подписчиков автора фоновой задачей
+(см. ``core.jobs``). В записи ленты хранится и дата поста, поэтому
+лента читается одним проходом по индексу ``(user, -pub_date)``, без
+сортировки постов. У авторов с очень большим числом подписчиков
+раскладка слишком дорога: их посты подмешиваются в ленту при чтении,
+а когда подписчиков снова становится не больше
+``TIMELINE_FANOUT_LIMIT``, последние посты автора раскладываются по
+лентам заново.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from . import caching
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+FANOUT_BATCH_SIZE = 1000
+# Сортировка ленты для пагинатора: по аннотациям ``followed_posts``.
+FEED_ORDERING = ("-feed_date", "-feed_post")
+
+
+def is_pulled(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def fan_out_post(post_id, author_id):
+    """Раскладывает пост по лентам подписчиков; фоновая задача."""
+    if is_pulled(author_id):
+        return
+    # Пост могли удалить, пока задача ждала в очереди.
+    pub_date = Post.objects.filter(pk=post_id).values_list(
+        "pub_date", flat=True
+    ).first()
+    if pub_date is None:
+        return
+    follower_ids = (
+        Follow.objects.filter(author_id=author_id)
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in follower_ids),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    # Версии сменились при сохранении поста, а ленты наполнились только
+    # сейчас. Версия главной входит в ETag ленты каждого читателя.
+    caching.bump_version(caching.INDEX)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты нового автора из подписок."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "pk", "pub_date"
+    )[:settings.TIMELINE_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True,
+    )
+
+
+FILL_AUTHOR_SQL = f"""
+    INSERT INTO {TimelineEntry._meta.db_table} (user_id, post_id, pub_date)
+    SELECT follow.user_id, post.id, post.pub_date
+    FROM {Follow._meta.db_table} follow
+    CROSS JOIN (
+        SELECT id, pub_date FROM {Post._meta.db_table}
+        WHERE author_id = %s
+        ORDER BY pub_date DESC
+        LIMIT %s
+    ) post
+    WHERE follow.author_id = %s AND NOT EXISTS (
+        SELECT 1 FROM {TimelineEntry._meta.db_table} entry
+        WHERE entry.user_id = follow.user_id AND entry.post_id = post.id
+    )
+"""
+
+
+def fill_author(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков.
+
+    Делает то же, что ``backfill`` для каждой подписки, но одним
+    ``INSERT ... SELECT``; возвращает число добавленных записей.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(FILL_AUTHOR_SQL, [
+            author_id, settings.TIMELINE_BACKFILL_SIZE, author_id,
+        ])
+        added = cursor.rowcount
+    if added:
+        caching.bump_version(caching.INDEX)
+    return added
+
+
+def left_pulled(author_id):
+    """Перестал ли автор быть «звездой» после отписки от него."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def trim(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def followed_posts(user):
+    """Посты из ленты пользователя и посты читаемых им «звёзд».
+
+    Сортировать результат нужно по ``FEED_ORDERING``. Без «звёзд» в
+    подписках это проход по индексу ленты, иначе посты из ленты и
+    посты «звёзд» объединяются и сортируются по дате.
+    """
+    pulled_authors = list(user.follower.filter(
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list("author", flat=True))
+    if not pulled_authors:
+        return Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F("timeline_entries__pub_date"),
+            feed_post=F("timeline_entries__post"),
+        )
+    return Post.objects.filter(
+        Q(pk__in=user.timeline.values("post"))
+        | Q(author__in=pulled_authors)
+    ).annotate(feed_date=F("pub_date"), feed_post=F("pk"))
@@ -0,0 +1,337 @@
+"""Выгрузка и загрузка данных сайта в формате JSON Lines.
+
+Каждая строка файла — одна запись вида ``{"type": "posts", "id": 1,
+...}``; записи идут по типам в порядке ``TYPES``, чтобы при загрузке
+связанные объекты уже существовали. Файл с расширением ``.gz``
+сжимается gzip. Файлы картинок не переносятся: в записи поста только
+имя файла в хранилище.
+
+При загрузке ключи не сохраняются как есть, а сдвигаются, поэтому
+загружать можно и в непустую базу: новый ключ — старый плюс сдвиг, и
+таблица соответствия не нужна. Перед загрузкой файл просматривается
+целиком, и для каждой таблицы резервируется диапазон ключей до сдвига
+плюс наибольший старый ключ: счётчик автоинкремента переставляется за
+его конец, и строки, которые сайт создаёт во время загрузки, не займут
+ключи загружаемых. Пользователи и группы с уже существующими именем
+или слагом не создаются заново, ссылки на них ведут на существующие
+записи. После каждой пачки номер строки, диапазоны и такие соответствия
+сохраняются в файл контрольной точки, и прерванную загрузку можно
+продолжить.
+"""
+import datetime
+import gzip
+import json
+import os
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from . import seeding
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 2000
+
+# Тип записи: модель, поля и ссылки на другие типы.
+TYPES = {
+    "users": (User, (
+        "id", "username", "password", "email", "first_name", "last_name",
+        "is_active", "is_staff", "is_superuser", "date_joined",
+        "last_login",
+    ), {}),
+    "groups": (Group, ("id", "title", "slug", "description"), {}),
+    "posts": (Post, (
+        "id", "author_id", "group_id", "text", "pub_date", "image",
+        "image_variants",
+    ), {"author_id": "users", "group_id": "groups"}),
+    "comments": (Comment, ("id", "post_id", "author_id", "text", "created"),
+                 {"post_id": "posts", "author_id": "users"}),
+    "follows": (Follow, ("id", "user_id", "author_id"),
+                {"user_id": "users", "author_id": "users"}),
+}
+# Уникальные поля, по которым запись совпадает с уже существующей.
+NATURAL_KEYS = {"users": "username", "groups": "slug"}
+
+
+class Encoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает время до миллисекунд, а выгрузка должна
+    # восстанавливать даты точно.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_file(path, mode, compress=None):
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def export(path, compress=None, chunk_size=CHUNK_SIZE, log=None):
+    """Выгружает все записи в файл; возвращает их число по типам."""
+    log = log or (lambda kind, count: None)
+    counts = {}
+    with open_file(path, "w", compress) as output:
+        for kind, (model, fields, _) in TYPES.items():
+            rows = model.objects.order_by("pk").values(*fields)
+            count = 0
+            for row in rows.iterator(chunk_size=chunk_size):
+                row = {"type": kind, **row}
+                output.write(json.dumps(row, cls=Encoder,
+                                        ensure_ascii=False))
+                output.write("\n")
+                count += 1
+                if count % chunk_size == 0:
+                    log(kind, count)
+            log(kind, count)
+            counts[kind] = count
+    return counts
+
+
+class Checkpoint:
+    """Состояние загрузки, которое переживает её прерывание."""
+
+    def __init__(self, path):
+        self.path = path
+        self.line = 0
+        # Зарезервированные ключи типа: от offsets[kind] + 1 до
+        # limits[kind] включительно.
+        self.offsets = {}
+        self.limits = {}
+        self.matches = {kind: {} for kind in NATURAL_KEYS}
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as source:
+            data = json.load(source)
+        self.line = data["line"]
+        self.offsets = data["offsets"]
+        self.limits = data["limits"]
+        self.matches = {
+            kind: {int(old): new for old, new in matches.items()}
+            for kind, matches in data["matches"].items()
+        }
+        return True
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path + ".tmp", "w", encoding="utf-8") as target:
+            json.dump({"line": self.line, "offsets": self.offsets,
+                       "limits": self.limits, "matches": self.matches},
+                      target)
+        os.replace(self.path + ".tmp", self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def new_id(self, kind, old_id):
+        if old_id is None:
+            return None
+        return self.matches.get(kind, {}).get(old_id,
+                                              old_id + self.offsets[kind])
+
+
+class Importer:
+    def __init__(self, checkpoint, batch_size=CHUNK_SIZE, log=None):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.log = log or (lambda kind, count: None)
+        self.counts = {kind: 0 for kind in TYPES}
+
+    def run(self, path, compress=None):
+        if not self.checkpoint.load():
+            # Диапазоны резервируются до первой вставки и сохраняются,
+            # чтобы продолжение загрузки писало в них же.
+            for kind, size in scan(path, compress).items():
+                model = TYPES[kind][0]
+                self.checkpoint.offsets[kind] = reserve_ids(model, size)
+                self.checkpoint.limits[kind] = (
+                    self.checkpoint.offsets[kind] + size
+                )
+            self.checkpoint.save()
+        kind, batch = None, []
+        line = 0
+        with open_file(path, "r", compress) as source:
+            for line, text in enumerate(source, 1):
+                if line <= self.checkpoint.line:
+                    continue
+                row = json.loads(text)
+                row_kind = row.pop("type")
+                if row_kind != kind or len(batch) == self.batch_size:
+                    self.flush(kind, batch, line - 1)
+                    kind, batch = row_kind, []
+                batch.append(row)
+        self.flush(kind, batch, line)
+        self.finish()
+        self.checkpoint.remove()
+        return self.counts
+
+    def flush(self, kind, rows, line):
+        if rows:
+            with transaction.atomic():
+                self.insert(kind, rows)
+            self.counts[kind] += len(rows)
+            self.log(kind, self.counts[kind])
+        if line > self.checkpoint.line:
+            self.checkpoint.line = line
+            self.checkpoint.save()
+
+    def insert(self, kind, rows):
+        model, _, references = TYPES[kind]
+        if kind in NATURAL_KEYS:
+            rows = self.skip_existing(kind, model, rows)
+        objects = []
+        for row in rows:
+            row["id"] = self.checkpoint.new_id(kind, row["id"])
+            for field, target in references.items():
+                row[field] = self.checkpoint.new_id(target, row[field])
+            if kind == "follows" and row["user_id"] == row["author_id"]:
+                continue
+            objects.append(model(**{
+                name: model._meta.get_field(name).to_python(value)
+                for name, value in row.items()
+            }))
+        # После сбоя между записью пачки и контрольной точкой пачка
+        # загружается снова. Ключи из зарезервированного диапазона
+        # никто, кроме загрузки, не выдаёт, поэтому уже занятые — это
+        # её же строки; любой другой конфликт должен остановить загрузку.
+        if objects:
+            loaded = set(model.objects.filter(pk__range=(
+                min(obj.pk for obj in objects),
+                max(obj.pk for obj in objects),
+            )).values_list("pk", flat=True))
+            objects = [obj for obj in objects if obj.pk not in loaded]
+        if kind == "follows":
+            objects = self.skip_existing_follows(objects)
+        with seeding.explicit_dates(Post, "pub_date"), \
+                seeding.explicit_dates(Comment, "created"):
+            model.objects.bulk_create(objects)
+
+    def skip_existing_follows(self, follows):
+        """Убирает подписки, которые уже есть между теми же людьми.
+
+        Пользователи из выгрузки могут совпасть с существующими по
+        имени, а подписка между ними — уже быть в базе.
+        """
+        existing = set(Follow.objects.filter(
+            user_id__in={follow.user_id for follow in follows},
+            author_id__in={follow.author_id for follow in follows},
+        ).values_list("user_id", "author_id"))
+        fresh = []
+        for follow in follows:
+            pair = (follow.user_id, follow.author_id)
+            if pair not in existing:
+                existing.add(pair)
+                fresh.append(follow)
+        return fresh
+
+    def skip_existing(self, kind, model, rows):
+        key = NATURAL_KEYS[kind]
+        existing = dict(
+            model.objects.filter(
+                **{f"{key}__in": [row[key] for row in rows]}
+            ).values_list(key, "pk")
+        )
+        matches = self.checkpoint.matches[kind]
+        fresh = []
+        for row in rows:
+            if row[key] in existing:
+                matches[row["id"]] = existing[row[key]]
+            else:
+                fresh.append(row)
+        return fresh
+
+    def imported(self, kind):
+        """Строки типа, вставленные загрузкой."""
+        model = TYPES[kind][0]
+        return model.objects.filter(pk__gt=self.checkpoint.offsets[kind],
+                                    pk__lte=self.checkpoint.limits[kind])
+
+    def finish(self):
+        """Строит данные, которые обычно поддерживают сигналы."""
+        user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+        seeding.rebuild_stats(user_ids.iterator(), self.batch_size)
+        seeding.fill_timelines()
+        posts = self.imported("posts")
+        seeding.index_posts(
+            posts.values_list("pk", flat=True).iterator(), self.batch_size
+        )
+        follows = self.imported("follows")
+        seeding.bump_versions(
+            set(posts.values_list("author_id", flat=True).distinct())
+            | set(follows.values_list("user_id", flat=True))
+            | set(follows.values_list("author_id", flat=True)),
+            set(posts.exclude(group=None).values_list(
+                "group_id", flat=True
+            ).distinct()),
+        )
+
+
+def scan(path, compress=None):
+    """Наибольший ключ каждого типа в файле выгрузки."""
+    sizes = {kind: 0 for kind in TYPES}
+    with open_file(path, "r", compress) as source:
+        for text in source:
+            if text.strip():
+                row = json.loads(text)
+                sizes[row["type"]] = max(sizes[row["type"]], row["id"])
+    return sizes
+
+
+def reserve_ids(model, size):
+    """Резервирует ``size`` ключей подряд; возвращает ключ перед ними.
+
+    Счётчик автоинкремента таблицы переставляется за конец диапазона в
+    той же транзакции, в которой читается, поэтому параллельная вставка
+    не получит ключ из него.
+    """
+    if not size:
+        return 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            # UPDATE первым делом берёт блокировку записи.
+            cursor.execute(
+                f"UPDATE sqlite_sequence "
+                f"SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) "
+                f"FROM {table})) + %s WHERE name = %s",
+                [size, model._meta.db_table],
+            )
+            if not cursor.rowcount:
+                cursor.execute(
+                    f"INSERT INTO sqlite_sequence (name, seq) "
+                    f"SELECT %s, COALESCE(MAX(id), 0) + %s FROM {table}",
+                    [model._meta.db_table, size],
+                )
+            cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = %s",
+                [model._meta.db_table],
+            )
+        elif connection.vendor == "postgresql":
+            # Блокировка не даёт вставить строку, пока счётчик
+            # переставляется; читать таблицу она не мешает.
+            cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                f"GREATEST(nextval(pg_get_serial_sequence(%s, 'id')) - 1, "
+                f"(SELECT COALESCE(MAX(id), 0) FROM {table})) + %s)",
+                [model._meta.db_table, model._meta.db_table, size],
+            )
+        else:
+            raise NotImplementedError(
+                f"Резервирование ключей не поддерживается для "
+                f"{connection.vendor}"
+            )
+        return cursor.fetchone()[0] - size
+
+
+def load(path, compress=None, checkpoint_path=None, batch_size=CHUNK_SIZE,
+         log=None):
+    """Загружает файл выгрузки; возвращает число записей по типам."""
+    importer = Importer(Checkpoint(checkpoint_path), batch_size, log)
+    return importer.run(path, compress)
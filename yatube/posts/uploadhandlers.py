@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    """Прерывает загрузку файла, как только он превышает допустимый размер.
+
+    Обработчик стоит первым в ``FILE_UPLOAD_HANDLERS`` и только считает
+    байты, передавая данные дальше; слишком большой файл не попадает в
+    ``request.FILES``, а у запроса выставляется ``upload_limit_exceeded``.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            self.request.upload_limit_exceeded = True
+            raise StopUpload()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = "posts"
 
@@ -12,7 +12,11 @@ urlpatterns = [
     path("create/", views.post_create, name="post_create"),
     path("posts/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     path("posts/<int:post_id>/comment", views.add_comment, name="add_comment"),
+    path("posts/<int:post_id>/comments/",
+         views.comment_list,
+         name="comment_list"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.post_search, name="search"),
     path("profile/<str:username>/follow/",
          views.profile_follow,
          name="profile_follow"),
@@ -21,4 +25,30 @@ urlpatterns = [
         views.profile_unfollow,
         name="profile_unfollow",
     ),
+    path("feed/", feeds.latest_rss, name="feed"),
+    path("feed/atom/", feeds.latest_atom, name="feed_atom"),
+    path("group/<slug:slug>/feed/", feeds.group_rss, name="group_feed"),
+    path("group/<slug:slug>/feed/atom/",
+         feeds.group_atom,
+         name="group_feed_atom"),
+    path("profile/<str:username>/feed/",
+         feeds.author_rss,
+         name="profile_feed"),
+    path("profile/<str:username>/feed/atom/",
+         feeds.author_atom,
+         name="profile_feed_atom"),
+    path("api/posts/", api.posts, name="api_posts"),
+    path("api/posts/export/", api.export_posts, name="api_export"),
+    path("api/posts/<int:post_id>/", api.post, name="api_post"),
+    path("api/posts/<int:post_id>/comments/",
+         api.post_comments,
+         name="api_comments"),
+    path("api/groups/", api.groups, name="api_groups"),
+    path("api/groups/<slug:slug>/posts/",
+         api.group_posts,
+         name="api_group_posts"),
+    path("api/profile/<str:username>/posts/",
+         api.profile_posts,
+         name="api_profile_posts"),
+    path("api/follow/", api.follow_posts, name="api_follow"),
 ]
@@ -1,62 +1,140 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from yatube import settings
+from django.views.decorators.http import condition
 
+from core.routers import reads_from_replica
+from . import caching, search, timeline
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import AuthorStats, Follow, Group, Post, User
+from .paginator import RankedPaginator, lazy_paginate, paginate
 
 
+def get_for_request(request, queryset, **lookup):
+    """Объект страницы, общий для вьюхи и функции её ETag.
+
+    ETag вычисляется до вызова вьюхи, а объект нужен обоим, поэтому он
+    загружается один раз и запоминается на запросе.
+    """
+    if not hasattr(request, "_loaded_objects"):
+        request._loaded_objects = {}
+    key = (queryset.model, tuple(sorted(lookup.items())))
+    if key not in request._loaded_objects:
+        request._loaded_objects[key] = get_object_or_404(queryset, **lookup)
+    return request._loaded_objects[key]
+
+
+def get_group(request, slug):
+    return get_for_request(request, Group.objects.all(), slug=slug)
+
+
+def get_author(request, username):
+    return get_for_request(
+        request, User.objects.select_related("stats"), username=username
+    )
+
+
+def get_post(request, post_id):
+    return get_for_request(
+        request,
+        Post.objects.for_feed().select_related("author__stats"),
+        pk=post_id,
+    )
+
+
+def index_etag(request):
+    return caching.make_etag(request, (caching.INDEX, None))
+
+
+def group_etag(request, slug):
+    group = get_group(request, slug)
+    return caching.make_etag(request, (caching.GROUP, group.pk))
+
+
+def profile_etag(request, username):
+    author = get_author(request, username)
+    return caching.make_etag(request, (caching.AUTHOR, author.pk))
+
+
+def post_detail_etag(request, post_id):
+    # На странице поста выводится и число постов автора.
+    post = get_post(request, post_id)
+    return caching.make_etag(
+        request, (caching.POST, post.pk), (caching.AUTHOR, post.author_id)
+    )
+
+
+def follow_index_etag(request):
+    # Лента меняется с любым постом и с подписками самого пользователя.
+    return caching.make_etag(
+        request, (caching.INDEX, None), (caching.AUTHOR, request.user.pk)
+    )
+
+
+@reads_from_replica
+@condition(etag_func=index_etag)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = lazy_paginate(request, post_list)
     context = {
         "page_obj": page_obj,
+        "cache_key": caching.index_cache_key(request),
+        "cache_timeout": caching.page_cache_timeout(),
     }
     return render(request, "posts/index.html", context)
 
 
+@reads_from_replica
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    group = get_group(request, slug)
+    post_list = group.posts.for_feed()
+    page_obj = lazy_paginate(request, post_list)
     context = {
         "group": group,
         "page_obj": page_obj,
+        "cache_key": caching.page_cache_key(
+            request, (caching.GROUP, group.pk)
+        ),
+        "cache_timeout": caching.page_cache_timeout(),
     }
     return render(request, "posts/group_list.html", context)
 
 
+@reads_from_replica
+@condition(etag_func=profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_author(request, username)
     main_user = request.user
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-    post_number = post_list.count()
-    follow = Follow.objects.filter(author=author.pk)
-    following = True if follow else False
+    post_list = author.posts.for_feed()
+    page_obj = lazy_paginate(request, post_list)
+    stats = AuthorStats.objects.for_user(author)
+    following = main_user.is_authenticated and Follow.objects.filter(
+        user=main_user, author=author
+    ).exists()
     context = {
         "main_user": main_user,
         "page_obj": page_obj,
-        "post_number": post_number,
+        "post_number": stats.posts_count,
+        "stats": stats,
         "author": author,
         "following": following,
+        "cache_key": caching.page_cache_key(
+            request, (caching.AUTHOR, author.pk)
+        ),
+        "cache_timeout": caching.page_cache_timeout(),
     }
     return render(request, "posts/profile.html", context)
 
 
+@reads_from_replica
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    user = get_object_or_404(User, username=post.author)
-    post_number = user.posts.filter(author=user).count()
-    comments = post.comments.all()
+    post = get_post(request, post_id)
+    post_number = AuthorStats.objects.for_user(post.author).posts_count
+    comments = paginate_comments(request, post.comments.all())
     form = CommentForm()
     context = {
         "post": post,
@@ -64,16 +142,48 @@ def post_detail(request, post_id):
         "post_id": post_id,
         "comments": comments,
         "form": form,
+        "cache_key": caching.page_cache_key(request, (caching.POST, post.pk)),
+        "cache_timeout": caching.page_cache_timeout(),
     }
     return render(request, "posts/post_detail.html", context)
 
 
+def comment_list(request, post_id):
+    post = get_object_or_404(Post.objects.only("pk"), pk=post_id)
+    context = {
+        "post_id": post_id,
+        "comments": paginate_comments(request, post.comments.all()),
+    }
+    return render(request, "posts/includes/comments.html", context)
+
+
+def paginate_comments(request, comments):
+    return lazy_paginate(
+        request,
+        comments.select_related("author").only(
+            "text", "created", "post_id", "author__username"
+        ),
+        settings.COMMENTS_PAGE_SIZE,
+        ordering=("-created", "-pk"),
+    )
+
+
+def upload_limit_exceeded(request):
+    # Разбор тела запроса запускает SizeLimitedUploadHandler.
+    request.FILES
+    return getattr(request, "upload_limit_exceeded", False)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
 
+    # Если загрузка оборвалась на первом же файле, request.POST пуст,
+    # но форма всё равно должна показать ошибку размера.
     form = PostForm(
-        request.POST or None,
+        request.POST if request.method == "POST" else None,
         files=request.FILES or None,
+        upload_limit_exceeded=upload_limit_exceeded(request),
     )
     if form.is_valid():
         post = form.save(commit=False)
@@ -93,9 +203,10 @@ def post_edit(request, post_id):
     if post.author != request.user:
         raise Http404
 
-    form = PostForm(request.POST or None,
+    form = PostForm(request.POST if request.method == "POST" else None,
                     files=request.FILES or None,
-                    instance=post)
+                    instance=post,
+                    upload_limit_exceeded=upload_limit_exceeded(request))
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -110,6 +221,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = Post.objects.get(pk=post_id)
     form = CommentForm(request.POST or None)
@@ -122,17 +234,18 @@ def add_comment(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     # Подписаться на автора
     author = get_object_or_404(User, username=username)
-    user = request.user
-    if author != user and not (Follow.objects.filter(
-            user=request.user, author=author).exists()):
-        Follow.objects.get_or_create(user=user, author=author)
+    if author != request.user:
+        # Повторную подписку отсекает уникальное ограничение в базе.
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect("posts:profile", username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     # Дизлайк, отписка
     author = get_object_or_404(User, username=username)
@@ -141,14 +254,29 @@ def profile_unfollow(request, username):
 
 
 @login_required
+@reads_from_replica
+@condition(etag_func=follow_index_etag)
 def follow_index(request):
-    user = request.user
-    author = user.follower.values_list("author", flat=True)
-    post_list = Post.objects.filter(author__in=author)
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    post_list = timeline.followed_posts(request.user).for_feed()
+    page_obj = paginate(request, post_list,
+                        ordering=timeline.FEED_ORDERING)
     context = {
         "page_obj": page_obj,
     }
     return render(request, "posts/follow.html", context)
+
+
+def post_search(request):
+    query = request.GET.get("q", "").strip()[:200]
+    page_obj = None
+    if query:
+        paginator = RankedPaginator(
+            lambda offset, limit: search.search(query, offset, limit),
+            settings.PAGE_SIZE,
+        )
+        page_obj = paginator.get_page(request.GET.get("page"))
+    context = {
+        "query": query,
+        "page_obj": page_obj,
+    }
+    return render(request, "posts/search.html", context)
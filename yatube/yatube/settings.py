@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.env import cache_from_url, database_from_url, get_bool, get_int
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -32,25 +34,83 @@ LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
 PAGE_SIZE = 10
-
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Сколько комментариев выводится на странице поста и подгружается
+# за один запрос.
+COMMENTS_PAGE_SIZE = 20
+# Сколько последних постов попадает в ленты RSS и Atom.
+FEED_SIZE = 20
+
+# Посты авторов, у которых подписчиков больше этого числа, не
+# раскладываются по лентам подписчиков, а подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL_SIZE = 200
+
+# Движок поиска по постам: 'fts5' (SQLite FTS5), 'python' (собственный
+# инвертированный индекс) или None — FTS5, если база его поддерживает.
+POSTS_SEARCH_BACKEND = None
+
+# Фоновые задачи (см. core/jobs.py): письма, миниатюры, раскладка постов
+# по лентам. С JOBS_ENABLED задачи пишутся в базу и выполняются командой
+# run_worker в JOBS_WORKERS процессах, без него — сразу, в запросе, и
+# тогда ответ ждёт почтовый сервер и раскладку по лентам. Без DEBUG
+# очередь включена по умолчанию, и run_worker должен быть запущен:
+# иначе задачи копятся в базе и не выполняются.
+JOBS_ENABLED = get_bool('JOBS_ENABLED', not DEBUG)
+JOBS_WORKERS = get_int('JOBS_WORKERS', 2)
+JOBS_POLL_INTERVAL = 1
+JOBS_MAX_ATTEMPTS = 5
+# Задержка перед повтором удваивается с каждой попыткой.
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 60 * 60
+# Через сколько секунд задачу, которую обработчик не завершил, может
+# забрать другой.
+JOBS_VISIBILITY_TIMEOUT = 5 * 60
+
+# Письма ставятся в очередь, а отправляет их QUEUED_EMAIL_BACKEND.
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Кэш общий для всех процессов приложения, см. core/env.py. Версия
+# входит в каждый ключ: её увеличение при выкладке разом делает
+# недоступным весь старый кэш.
+CACHE_URL = os.environ.get('CACHE_URL', 'locmem://')
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'yatube')
+CACHE_VERSION = get_int('CACHE_VERSION', 1)
+PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL', CACHE_URL)
+# Сигналы меняют версии страниц только в кэше своего процесса. Если кэш
+# страниц не общий (locmem при нескольких процессах сервера), другие
+# процессы отдавали бы устаревшие фрагменты и ответы 304, поэтому ETag
+# не выдаются, а фрагменты живут PAGE_CACHE_LOCAL_TIMEOUT секунд.
+# Для одного процесса (runserver) locmem можно объявить общим.
+PAGE_CACHE_SHARED = get_bool(
+    'PAGE_CACHE_SHARED', not PAGE_CACHE_URL.startswith('locmem:')
+)
+PAGE_CACHE_LOCAL_TIMEOUT = 10
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    },
-    'index_page': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': '/var/tmp/django_cache',
-        'TIMEOUT': 20,
-    }
+    'default': cache_from_url(
+        CACHE_URL,
+        KEY_PREFIX=CACHE_KEY_PREFIX,
+        VERSION=CACHE_VERSION,
+    ),
+    # Фрагменты страниц (главной, групп, профилей, постов) и счётчики
+    # их версий. Сигналы меняют версию, поэтому срок жизни нужен только
+    # как страховка и для вытеснения старых фрагментов.
+    'index_page': cache_from_url(
+        PAGE_CACHE_URL,
+        KEY_PREFIX=f'{CACHE_KEY_PREFIX}:pages',
+        VERSION=CACHE_VERSION,
+        TIMEOUT=60 * 60,
+        LOCATION='pages',
+    ),
 }
 
 # Application definition
 
 INSTALLED_APPS = [
-    'core',
+    'core.apps.CoreConfig',
     'about.apps.AboutConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
@@ -64,6 +124,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,12 +135,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Профилирование всех запросов (core/profiling.py). Без него сотрудник
+# может профилировать отдельный запрос заголовком «X-Profile: 1».
+PROFILING_ENABLED = get_bool('PROFILING_ENABLED', False)
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfiledDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -99,11 +165,50 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# База задаётся DATABASE_URL, см. core/env.py. Соединения живут
+# DATABASE_CONN_MAX_AGE секунд и переиспользуются между запросами.
+# За PgBouncer в режиме транзакций (DATABASE_POOLER=pgbouncer)
+# серверные курсоры отключаются: они не переживают смену соединения.
+DATABASE_URL = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')
+)
+DATABASE_POOLER = os.environ.get('DATABASE_POOLER', '')
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_from_url(
+        DATABASE_URL,
+        CONN_MAX_AGE=get_int('DATABASE_CONN_MAX_AGE', 60),
+        DISABLE_SERVER_SIDE_CURSORS=DATABASE_POOLER == 'pgbouncer',
+    ),
+}
+
+# Реплики только для чтения: DATABASE_REPLICA_URLS через запятую.
+# Вьюхи лент и постов читают с них (core/routers.py); после записи
+# пользователь REPLICA_PIN_SECONDS секунд читает с основной базы.
+DATABASE_REPLICA_URLS = [
+    url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+    if url
+]
+for number, url in enumerate(DATABASE_REPLICA_URLS, 1):
+    DATABASES[f'replica{number}'] = database_from_url(
+        url,
+        CONN_MAX_AGE=DATABASES['default']['CONN_MAX_AGE'],
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = get_int('REPLICA_PIN_SECONDS', 10)
+
+# Применяются к каждому новому соединению с SQLite (core/signals.py).
+# WAL позволяет читать во время записи, busy_timeout — ждать
+# блокировку вместо ошибки «database is locked».
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
 }
 
 
@@ -156,3 +261,40 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Карта сайта строится командой build_sitemaps (posts/sitemaps.py) и
+# отдаётся веб-сервером как статика. SITE_URL нужен для абсолютных
+# адресов в файлах карты.
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+SITEMAP_URL = '/sitemaps/'
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+
+# Варианты картинок постов строятся заранее в пуле процессов: все
+# размеры во всех форматах, которые поддерживает Pillow, плюс JPEG.
+# POST_THUMBNAIL_GEOMETRY — размер для <img src> у старых браузеров.
+# При POST_IMAGE_WORKERS = 0 варианты строятся прямо в запросе, а с
+# JOBS_ENABLED — обработчиком фоновых задач. В пуле одновременно не
+# больше POST_IMAGE_MAX_PENDING заказов, остальные посты достраивает
+# команда generate_thumbnails.
+POST_THUMBNAIL_GEOMETRIES = ['480x170', '960x339', '1440x508']
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_IMAGE_FORMATS = ['AVIF', 'WEBP', 'JPEG']
+POST_IMAGE_WORKERS = 2
+POST_IMAGE_MAX_PENDING = 100
+
+# Загрузки пишутся во временные файлы частями и обрываются, как только
+# файл превышает POST_IMAGE_MAX_UPLOAD_SIZE. Картинки с разрешением
+# больше POST_IMAGE_MAX_PIXELS отклоняются по заголовку, остальные
+# перекодируются без EXIF со стороной не больше POST_IMAGE_MAX_SIDE.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploadhandlers.SizeLimitedUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Картинки постов хранятся по хешу содержимого и делятся между постами.
+# Файлы моложе POST_IMAGE_GC_GRACE_PERIOD секунд не удаляются: на них
+# может ссылаться пост, транзакция которого ещё не зафиксирована.
+POST_IMAGE_GC_GRACE_PERIOD = 60 * 60